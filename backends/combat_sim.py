@@ -0,0 +1,186 @@
+"""Monte Carlo combat simulator used to estimate how deadly an encounter is.
+
+The model is deliberately simple: every round each living combatant makes its attacks against a living
+opponent, using a d20 against armour class, with natural 20s doubling the damage dice. Thousands of fights
+are played out at once with NumPy, one array row per fight."""
+import re
+import time
+from collections import namedtuple
+from typing import List, Optional
+
+import numpy as np
+
+AttackStats = namedtuple('AttackStats',
+                         'bonus dice_count dice_sides damage_bonus')
+
+CombatantStats = namedtuple('CombatantStats',
+                            'name armor_class hit_points attacks')
+
+SimulationResult = namedtuple('SimulationResult',
+                              'trials party_ko_chance any_down_chance victory_chance expected_rounds')
+
+MAX_ROUNDS = 20  # fights still undecided after this many rounds count as neither a win nor a party KO
+BATCH_SIZE = 1000  # fights simulated together; the time budget is checked between batches
+
+# Monster statistics by challenge rating, Dungeon Master's Guide p. 274, keyed by XP value.
+# Used when a monster cannot be found in the SRD: (armor class, hit points, attack bonus, damage per round)
+XP_STATS = {
+    10: (13, 4, 3, 1),
+    25: (13, 21, 3, 3),
+    50: (13, 42, 3, 5),
+    100: (13, 60, 3, 7),
+    200: (13, 78, 3, 12),
+    450: (13, 93, 3, 18),
+    700: (13, 108, 4, 24),
+    1100: (14, 123, 5, 30),
+    1800: (15, 138, 6, 36),
+    2300: (15, 153, 6, 42),
+    2900: (15, 168, 6, 48),
+    3900: (16, 183, 7, 54),
+    5000: (16, 198, 7, 60),
+    5900: (17, 213, 7, 66),
+    7200: (17, 228, 8, 72),
+    8400: (17, 243, 8, 78),
+    10000: (18, 258, 8, 84),
+    11500: (18, 273, 8, 90),
+    13000: (18, 288, 8, 96),
+    15000: (18, 303, 9, 102),
+    18000: (19, 318, 10, 108),
+    20000: (19, 333, 10, 114),
+    22000: (19, 348, 10, 120),
+    25000: (19, 378, 10, 132),
+    33000: (19, 423, 11, 150),
+    41000: (19, 468, 11, 168),
+    50000: (19, 513, 11, 186),
+    62000: (19, 558, 12, 204),
+    155000: (22, 805, 14, 303),
+}
+
+NUMBER_WORDS = {'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6}
+
+
+def party_stats(plevel: int, psize: int) -> List[CombatantStats]:
+    """Build a party of identical, generic martial characters of the given level."""
+    proficiency = 2 + (plevel - 1) // 4
+    ability = 3 + (plevel >= 8)
+    attack = AttackStats(proficiency + ability, 1, 8, ability)
+    attacks = (attack,) * (1 + (plevel >= 5) + (plevel >= 11))
+    hit_points = 10 + (plevel - 1) * 7
+    armor_class = 15 + plevel // 8
+    return [CombatantStats(f'Adventurer {i + 1}', armor_class, hit_points, attacks) for i in range(psize)]
+
+
+def stats_from_xp(name: str, xp: int) -> CombatantStats:
+    """Estimate a monster's statistics from its XP value when no stat block is available."""
+    key = min(XP_STATS, key=lambda value: abs(value - xp))
+    armor_class, hit_points, bonus, damage = XP_STATS[key]
+    return CombatantStats(name, armor_class, hit_points, (AttackStats(bonus, 0, 1, damage),))
+
+
+def stats_from_srd(monster: dict, xp: int) -> CombatantStats:
+    """Extract combat statistics from a monster given in the dnd5eapi JSON schema.
+
+    The monster uses its most damaging attack action, as many times as its Multiattack allows.
+    Monsters without any attack actions fall back to the XP-based estimate for their attacks."""
+    attacks = []
+    multiattack = 1
+    for action in monster.get('actions', []):
+        if action['name'] == 'Multiattack':
+            match = re.search(r'makes (two|three|four|five|six)', action['desc'])
+            if match:
+                multiattack = NUMBER_WORDS[match.group(1)]
+            continue
+        dice = re.search(r'(\d+)d(\d+)', action.get('damage_dice', ''))
+        if 'attack_bonus' not in action or dice is None:
+            continue
+        attacks.append(AttackStats(action['attack_bonus'], int(dice.group(1)), int(dice.group(2)),
+                                   action.get('damage_bonus', 0)))
+    if not attacks:
+        attacks = stats_from_xp(monster['name'], xp).attacks
+        multiattack = 1
+    best = max(attacks, key=lambda a: a.dice_count * (a.dice_sides + 1) / 2 + a.damage_bonus)
+    return CombatantStats(monster['name'], monster['armor_class'], monster['hit_points'], (best,) * multiattack)
+
+
+def _attack(rng, attack: AttackStats, target_ac, active):
+    """Resolve one attack in every fight at once and return the damage dealt per fight."""
+    rolls = rng.integers(1, 21, size=active.shape)
+    crits = rolls == 20
+    hits = active & (rolls != 1) & (crits | (rolls + attack.bonus >= target_ac))
+    if attack.dice_count:
+        faces = rng.integers(1, attack.dice_sides + 1, size=(active.size, 2 * attack.dice_count))
+        damage = faces[:, :attack.dice_count].sum(axis=1) + crits * faces[:, attack.dice_count:].sum(axis=1)
+    else:
+        damage = np.zeros(active.shape, dtype=np.int64)
+    return np.where(hits, damage + attack.damage_bonus, 0)
+
+
+def _side_attacks(rng, attackers, attacker_hp, defenders, defender_hp, active, focus: bool):
+    """Let every living attacker make its attacks against a living defender, in place.
+
+    With 'focus', attackers concentrate on the first living defender; otherwise each attack
+    picks a random living defender."""
+    fights = np.arange(active.size)
+    defender_ac = np.array([defender.armor_class for defender in defenders])
+    for index, attacker in enumerate(attackers):
+        for attack in attacker.attacks:
+            alive = defender_hp > 0
+            if focus:
+                target = np.argmax(alive, axis=1)
+            else:
+                target = np.argmax(rng.random(alive.shape) * alive, axis=1)
+            can_attack = active & (attacker_hp[:, index] > 0) & alive.any(axis=1)
+            defender_hp[fights, target] -= _attack(rng, attack, defender_ac[target], can_attack)
+
+
+def _simulate_batch(rng, party, monsters, trials: int, max_rounds: int):
+    """Play out 'trials' fights and return per-fight (party KO, anyone down, victory, rounds) arrays."""
+    party_hp = np.tile(np.array([member.hit_points for member in party]), (trials, 1))
+    monster_hp = np.tile(np.array([monster.hit_points for monster in monsters]), (trials, 1))
+    party_first = rng.random(trials) < 0.5  # initiative for the whole side
+    rounds = np.zeros(trials, dtype=np.int64)
+    anyone_down = np.zeros(trials, dtype=bool)
+    for _ in range(max_rounds):
+        ongoing = (party_hp > 0).any(axis=1) & (monster_hp > 0).any(axis=1)
+        if not ongoing.any():
+            break
+        rounds += ongoing
+        _side_attacks(rng, party, party_hp, monsters, monster_hp, ongoing & party_first, focus=True)
+        _side_attacks(rng, monsters, monster_hp, party, party_hp, ongoing, focus=False)
+        _side_attacks(rng, party, party_hp, monsters, monster_hp, ongoing & ~party_first, focus=True)
+        anyone_down |= (party_hp <= 0).any(axis=1)
+    party_ko = (party_hp <= 0).all(axis=1)
+    victory = (monster_hp <= 0).all(axis=1) & ~party_ko
+    return party_ko, anyone_down, victory, rounds
+
+
+def simulate(party: List[CombatantStats], monsters: List[CombatantStats], trials: int = 5000,
+             max_rounds: int = MAX_ROUNDS, time_budget: Optional[float] = None, seed=None) -> SimulationResult:
+    """Simulate a fight between the party and the monsters 'trials' times.
+
+    If 'time_budget' (seconds) runs out, the simulation stops after the current batch and the result
+    is based on the fights played so far. Returns a SimulationResult with chances in range 0-1."""
+    rng = np.random.default_rng(seed)
+    deadline = None if time_budget is None else time.monotonic() + time_budget
+    played = party_ko = any_down = victories = rounds = 0
+    while played < trials:
+        batch = min(BATCH_SIZE, trials - played)
+        ko, down, victory, batch_rounds = _simulate_batch(rng, party, monsters, batch, max_rounds)
+        played += batch
+        party_ko += int(ko.sum())
+        any_down += int(down.sum())
+        victories += int(victory.sum())
+        rounds += int(batch_rounds.sum())
+        if deadline is not None and time.monotonic() > deadline:
+            break
+    return SimulationResult(played, party_ko / played, any_down / played, victories / played, rounds / played)
+
+
+def final_simulation(result: SimulationResult, monsters: List[CombatantStats]) -> str:
+    """Creates the message that will be sent to the user"""
+    sim = f'Simulated {result.trials} fights against: {", ".join(m.name for m in monsters)}\n'
+    sim += f'Party wiped out: **{result.party_ko_chance:.1%}**\n'
+    sim += f'At least one adventurer dropped to 0 HP: **{result.any_down_chance:.1%}**\n'
+    sim += f'Party victorious: **{result.victory_chance:.1%}**\n'
+    sim += f'Expected length of the fight: **{result.expected_rounds:.1f}** rounds'
+    return sim
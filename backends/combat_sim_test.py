@@ -0,0 +1,41 @@
+"""Pytests for combat_sim.py"""
+
+import combat_sim as m
+
+
+def test_party_stats():
+    party = m.party_stats(5, 4)
+    assert len(party) == 4
+    assert len(party[0].attacks) == 2
+    assert m.party_stats(1, 1)[0].hit_points == 10
+
+
+def test_stats_from_srd():
+    goblin = {'name': 'Goblin', 'armor_class': 15, 'hit_points': 7,
+              'actions': [{'name': 'Scimitar', 'desc': '', 'attack_bonus': 4, 'damage_dice': '1d6', 'damage_bonus': 2},
+                          {'name': 'Shortbow', 'desc': '', 'attack_bonus': 4, 'damage_dice': '1d6', 'damage_bonus': 2}]}
+    stats = m.stats_from_srd(goblin, 50)
+    assert stats.armor_class == 15
+    assert stats.attacks == (m.AttackStats(4, 1, 6, 2),)
+    goblin['actions'].insert(0, {'name': 'Multiattack', 'desc': 'The goblin makes two attacks.'})
+    assert len(m.stats_from_srd(goblin, 50).attacks) == 2
+    # no attack actions: fall back to XP-based attacks
+    assert m.stats_from_srd({'name': 'Mage', 'armor_class': 12, 'hit_points': 40}, 2300).attacks
+
+
+def test_simulate():
+    party = m.party_stats(5, 4)
+    rats = [m.stats_from_xp('rat', 10)]
+    result = m.simulate(party, rats, trials=2000, seed=1)
+    assert result.trials == 2000
+    assert result.party_ko_chance == 0
+    assert result.victory_chance == 1
+    dragon = [m.stats_from_xp('ancient red dragon', 50000)]
+    result = m.simulate(party, dragon, trials=2000, seed=1)
+    assert result.party_ko_chance > 0.9
+    assert result.any_down_chance >= result.party_ko_chance
+
+
+def test_simulate_time_budget():
+    result = m.simulate(m.party_stats(1, 1), [m.stats_from_xp('ogre', 450)], trials=100000, time_budget=0)
+    assert result.trials == m.BATCH_SIZE
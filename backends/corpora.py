@@ -0,0 +1,69 @@
+"""Registry of the line-based text corpora in resources/, such as bonds.txt or greetings.txt.
+
+Every file is read once into a tuple of its non-empty lines and kept in memory. A file is only read
+again when its modification time has changed, and that is checked at most every CHECK_INTERVAL
+seconds, so drawing from a corpus normally doesn't touch the disk at all.
+
+Usage:
+    bond = corpora.choice(BONDS_FILE)
+    quests = corpora.choices(QUESTS_FILE, 3)"""
+import logging
+import os
+import random
+from collections import namedtuple
+from pathlib import Path
+from time import monotonic
+from typing import Dict, List, Optional, Sequence, Tuple
+
+log = logging.getLogger('bot.' + __name__)
+
+CHECK_INTERVAL = 30  # seconds between checks for a changed file
+
+Corpus = namedtuple('Corpus',
+                    'lines mtime checked')
+
+_corpora: Dict[Path, Corpus] = {}
+
+
+def _read(path: Path, mtime: float) -> Corpus:
+    log.debug('Loading corpus %s', path)
+    with open(path, encoding='utf-8') as f:
+        lines = tuple(line.rstrip('\n') for line in f if line.strip())
+    return Corpus(lines, mtime, monotonic())
+
+
+def lines(path: Path) -> Tuple[str, ...]:
+    """Return the non-empty lines of a file, from memory unless the file has changed."""
+    path = Path(path)
+    corpus = _corpora.get(path)
+    if corpus is not None and monotonic() - corpus.checked < CHECK_INTERVAL:
+        return corpus.lines
+    mtime = os.stat(path).st_mtime
+    if corpus is None or corpus.mtime != mtime:
+        corpus = _read(path, mtime)
+    else:
+        corpus = corpus._replace(checked=monotonic())
+    _corpora[path] = corpus
+    return corpus.lines
+
+
+def load(*paths: Path):
+    """Read files into the registry ahead of their first use, e.g. when a cog is loaded."""
+    for path in paths:
+        lines(path)
+
+
+def choice(path: Path) -> str:
+    """Return a random line of a file."""
+    return random.choice(lines(path))
+
+
+def choices(path: Path, k: int = 1, weights: Optional[Sequence[float]] = None) -> List[str]:
+    """Return k random lines of a file, with replacement. 'weights' has a relative weight for every line."""
+    return random.choices(lines(path), weights=weights, k=k)
+
+
+def sample(path: Path, k: int) -> List[str]:
+    """Return k different random lines of a file, or all of them in random order if it has fewer."""
+    corpus = lines(path)
+    return random.sample(corpus, min(k, len(corpus)))
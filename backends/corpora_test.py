@@ -0,0 +1,26 @@
+"""Pytests for corpora.py"""
+
+import os
+
+import corpora as m
+
+
+def test_lines(tmp_path):
+    path = tmp_path / 'corpus.txt'
+    path.write_text('first\n\nsecond\n', encoding='utf-8')
+    assert m.lines(path) == ('first', 'second')
+    assert m.choice(path) in ('first', 'second')
+    assert len(m.choices(path, 5)) == 5
+    assert m.choices(path, 3, weights=[0, 1]) == ['second'] * 3
+    assert sorted(m.sample(path, 5)) == ['first', 'second']
+
+
+def test_reload(tmp_path, monkeypatch):
+    path = tmp_path / 'corpus.txt'
+    path.write_text('old\n', encoding='utf-8')
+    assert m.lines(path) == ('old',)
+    path.write_text('new\n', encoding='utf-8')
+    os.utime(path, (1, 1))
+    assert m.lines(path) == ('old',)  # not checked again yet
+    monkeypatch.setattr(m, 'CHECK_INTERVAL', 0)
+    assert m.lines(path) == ('new',)
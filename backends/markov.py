@@ -0,0 +1,149 @@
+"""Character-level Markov chain name generators, trained from the bundled text corpora.
+
+Each model maps the last ORDER characters of a name to the characters that can follow them,
+with cumulative counts for a weighted draw. Trained models are kept in a cache file next to the
+resources and are only retrained when a corpus changes.
+
+Import the 'models' name from this module for access to the trained models."""
+import hashlib
+import logging
+import pickle
+import random
+from bisect import bisect
+from collections import Counter, defaultdict, namedtuple
+from itertools import accumulate
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from backends import name_gen
+
+log = logging.getLogger('bot.' + __name__)
+
+CACHE_FILE = Path('resources') / 'cache' / 'markov.pickle'
+CACHE_PROTOCOL = 4  # readable from Python 3.4 on; HIGHEST_PROTOCOL of a newer Python isn't
+TOWNNAMES_FILE = Path('resources') / 'townnames.txt'
+ORDER = 3
+START, END = '\x02', '\x03'  # padding around every name, never part of a corpus
+CACHE_VERSION = 1
+NAME_SAMPLE = 1000  # names generated per race to train the NPC name models
+MAX_ATTEMPTS = 100  # tries to come up with a name that isn't in the corpus
+MIN_LENGTH, MAX_LENGTH = 3, 30
+SEARCH_LIMIT = 100_000  # partial names explored while checking that a model can invent anything
+
+MarkovModel = namedtuple('MarkovModel',
+                         'fingerprint order transitions corpus')
+
+
+def train(lines: List[str], order: int = ORDER, fingerprint: str = '') -> MarkovModel:
+    """Count which character follows every 'order' characters in the given lines."""
+    counts = defaultdict(Counter)
+    corpus = set()
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        corpus.add(line.casefold())
+        padded = START * order + line + END
+        for i in range(len(line) + 1):
+            counts[padded[i:i + order]][padded[i + order]] += 1
+    transitions = {context: (''.join(following), tuple(accumulate(following.values())))
+                   for context, following in counts.items()}
+    return MarkovModel(fingerprint, order, transitions, frozenset(corpus))
+
+
+def generate(model: MarkovModel, min_length: int = MIN_LENGTH, max_length: int = MAX_LENGTH) -> Optional[str]:
+    """Generate a name that doesn't appear in the model's corpus, or None if none was found."""
+    for _ in range(MAX_ATTEMPTS):
+        context = START * model.order
+        name = ''
+        while len(name) <= max_length:
+            chars, cumulative = model.transitions[context]
+            char = chars[bisect(cumulative, random.random() * cumulative[-1])]
+            if char == END:
+                break
+            name += char
+            context = context[1:] + char
+        if min_length <= len(name) <= max_length and name.casefold() not in model.corpus:
+            return name
+    return None
+
+
+def generate_batch(model: MarkovModel, amount: int) -> List[str]:
+    """Generate up to 'amount' different names."""
+    names = []
+    for _ in range(amount * 2):
+        name = generate(model)
+        if name is not None and name not in names:
+            names.append(name)
+        if len(names) == amount:
+            break
+    return names
+
+
+def can_invent(model: MarkovModel) -> bool:
+    """Whether the model can generate any name that isn't in its corpus.
+
+    Corpora with only a few short sounds, like the orc names, may already hold every name their
+    model can produce. Gives True if the search grows past SEARCH_LIMIT, as such a model can
+    produce far more names than a corpus holds."""
+    stack = ['']
+    for _ in range(SEARCH_LIMIT):
+        if not stack:
+            return False
+        name = stack.pop()
+        context = (START * model.order + name)[-model.order:]
+        for char in model.transitions[context][0]:
+            if char == END:
+                if MIN_LENGTH <= len(name) and name.casefold() not in model.corpus:
+                    return True
+            elif len(name) < MAX_LENGTH:
+                stack.append(name + char)
+    return True
+
+
+def _fingerprint(*parts: bytes) -> str:
+    digest = hashlib.sha1(str((CACHE_VERSION, ORDER)).encode())
+    for part in parts:
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def _corpora() -> Dict[str, tuple]:
+    """Map every model name to (fingerprint, function returning the training lines)."""
+    corpora = {'townname': (_fingerprint(TOWNNAMES_FILE.read_bytes()),
+                            lambda: TOWNNAMES_FILE.read_text(encoding='utf-8').splitlines())}
+    namegen = name_gen.NAMEFILE.read_bytes()
+    for race in name_gen.races:
+        corpora[race] = (_fingerprint(namegen, race.encode()),
+                         lambda race=race: name_gen.name_batch(race, 'm', NAME_SAMPLE // 2) +
+                         name_gen.name_batch(race, 'f', NAME_SAMPLE // 2))
+    return corpora
+
+
+def load_models(cache_file: Path = CACHE_FILE) -> Dict[str, MarkovModel]:
+    """Load the trained models from the cache file, retraining any whose corpus has changed."""
+    try:
+        with open(cache_file, 'rb') as f:
+            cached = {name: MarkovModel(*model) for name, model in pickle.load(f).items()}
+    except (OSError, EOFError, TypeError, ValueError, pickle.UnpicklingError):  # e.g. written by a newer Python
+        cached = {}
+    models = {}
+    retrained = False
+    for name, (fingerprint, lines) in _corpora().items():
+        model = cached.get(name)
+        if model is None or model.fingerprint != fingerprint:
+            log.debug('Training Markov model: %s', name)
+            model = train(lines(), fingerprint=fingerprint)
+            retrained = True
+        models[name] = model
+    if retrained or models.keys() != cached.keys():
+        cache_file.parent.mkdir(exist_ok=True)
+        with open(cache_file, 'wb') as f:
+            # plain tuples, so the file doesn't depend on where this module was imported from, and a
+            # protocol that every supported Python can read
+            pickle.dump({name: tuple(model) for name, model in models.items()}, f, protocol=CACHE_PROTOCOL)
+    return models
+
+
+# for export: trained models by corpus name ('townname' or a race), leaving out those that can't invent names
+models = {name: model for name, model in load_models().items() if can_invent(model)}
@@ -0,0 +1,35 @@
+"""Pytests for markov.py"""
+
+import markov as m
+
+
+def test_train():
+    model = m.train(['abc', 'abd'], order=2)
+    assert model.transitions[m.START * 2] == ('a', (2,))
+    chars, cumulative = model.transitions['ab']
+    assert sorted(chars) == ['c', 'd']
+    assert cumulative[-1] == 2
+    assert model.corpus == frozenset(['abc', 'abd'])
+
+
+def test_generate():
+    assert len(m.generate_batch(m.models['townname'], 10)) == 10
+    for name in m.models:
+        names = m.generate_batch(m.models[name], 10)
+        assert names
+        assert len(set(names)) == len(names)
+        assert not any(generated.casefold() in m.models[name].corpus for generated in names)
+
+
+def test_can_invent():
+    assert m.can_invent(m.train(['abc', 'bcd'], order=1))  # 'abcd'
+    assert not m.can_invent(m.train(['abc', 'abd'], order=1))
+    assert 'orc' not in m.models
+    assert 'townname' in m.models
+
+
+def test_cache(tmp_path):
+    cache_file = tmp_path / 'markov.pickle'
+    models = m.load_models(cache_file)
+    assert cache_file.exists()
+    assert m.load_models(cache_file) == models
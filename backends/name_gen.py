@@ -1,42 +1,93 @@
-import random as r  # ɂ/Ɂ
-import yaml
+"""Functions used to run the name command.
+
+The phoneme tables in namegen.yaml are compiled once at import into arrays of sounds and
+probabilities per (race, gender), so that names can be drawn in bulk with NumPy."""
+from collections import namedtuple
 from pathlib import Path
+from typing import List
+
+import numpy as np
+import yaml
 
 # description of namegen data format is in this file:
 NAMEFILE = Path('resources') / 'namegen.yaml'
+IPA_NOTE = 'This is written with IPA symbols; search IPA(International Phonetic Alphabet) for more information'
+MAX_NAMES = 50
+
+Sounds = namedtuple('Sounds',
+                    'symbols probs')
+
+NameTable = namedtuple('NameTable',
+                       'syllables onset nucleus length tones coda onsets vowels tones_per_vowel codas')
+
+_rng = np.random.default_rng()
+
+
+def _compile_sounds(weights: dict) -> Sounds:
+    """Turn a {sound: weight} mapping into arrays for np.random.Generator.choice."""
+    symbols = np.array(list(weights.keys()))
+    probs = np.array(list(weights.values()), dtype=float)
+    if probs.sum() == 0:  # sound is never used, e.g. tones for languages without them
+        return Sounds(np.array(['']), np.ones(1))
+    return Sounds(symbols, probs / probs.sum())
+
+
+def _compile_table(table: dict) -> NameTable:
+    syllables = np.array(table['syl'], dtype=float)
+    return NameTable(syllables / syllables.sum(),
+                     _compile_sounds(table['onset']),
+                     _compile_sounds(table['nucleus']),
+                     _compile_sounds(table['length']),
+                     _compile_sounds(table['tones']),
+                     _compile_sounds(table['coda']),
+                     table['syllable_structures'][0],
+                     table['vowels'][0],
+                     table['vowels'][1],
+                     table['syllable_structures'][1])
+
 
 with open(NAMEFILE, encoding='utf8') as f:
     data = yaml.safe_load(f)
 
+tables = {(race, gender): _compile_table(table)
+          for race, genders in data.items()
+          for gender, table in genders.items()}
+races = sorted(data)
 
-def name_gen(race: str, gender: str) -> str:
-    table = data[race.lower()][gender.lower()[0]]
-    # choose number of syllables based on provided probability weights
-    syllables = r.choices(range(1, len(table['syl']) + 1),
-                          weights=table['syl'])[0]
-    output = ""
-    for syllable in range(syllables):
-        for onset in range(0, table['syllable_structures'][0]):
-            output += r.choices(list(table['onset'].keys()),
-                                weights=table['onset'].values())[0]
-
-        for vowel in range(0, table['vowels'][0]):
-            output += r.choices(list(table['nucleus'].keys()),
-                                weights=table['nucleus'].values())[0]
-            output += r.choices(list(table['length'].keys()),
-                                weights=table['length'].values())[0]
-            for tone in range(0, table['vowels'][1]):
-                output += r.choices(list(table['tones'].keys()),
-                                    weights=table['tones'].values())[0]
-
-        for coda in range(0, table['syllable_structures'][1]):
-            output += r.choices(list(table['coda'].keys()),
-                                weights=table['coda'].values())[0]
 
+def _draw(sounds: Sounds, amount: int) -> np.ndarray:
+    return _rng.choice(sounds.symbols, size=amount, p=sounds.probs)
+
+
+def name_batch(race: str, gender: str, amount: int = 1) -> List[str]:
+    """Generate 'amount' names for a race and gender, e.g. name_batch('elf', 'f', 10).
+
+    Every sound of every syllable is drawn for all names at once. Raises KeyError for unknown races."""
+    race = race.lower()
+    table = tables[race, gender.lower()[0]]
+    # choose number of syllables based on provided probability weights
+    counts = _rng.choice(len(table.syllables), size=amount, p=table.syllables) + 1
+    total = int(counts.sum())
+    slots = [_draw(table.onset, total) for _ in range(table.onsets)]
+    for _ in range(table.vowels):
+        slots.append(_draw(table.nucleus, total))
+        slots.append(_draw(table.length, total))
+        slots.extend(_draw(table.tones, total) for _ in range(table.tones_per_vowel))
+    slots.extend(_draw(table.coda, total) for _ in range(table.codas))
+    syllables = np.full(total, '')
+    for slot in slots:
+        syllables = np.char.add(syllables, slot)
+    names = []
+    start = 0
+    for count in counts:
+        name = ''.join(syllables[start:start + count])
         # special postfix for short human names
-        if race == "human" and syllables <= 2:
-            output += "i"
+        if race == 'human' and count <= 2:
+            name += 'i'
+        names.append(name)
+        start += count
+    return names
 
-        print(output)
-        output += " This is written with IPA symbols; search IPA(International Phonetic Alphabet) for more information "
-        return output
+
+def name_gen(race: str, gender: str) -> str:
+    return f'{name_batch(race, gender)[0]} {IPA_NOTE}'
@@ -0,0 +1,19 @@
+"""Pytests for name_gen.py"""
+
+import name_gen as m
+
+
+def test_name_batch():
+    for race, gender in m.tables:
+        names = m.name_batch(race, gender, 20)
+        assert len(names) == 20
+        assert all(isinstance(name, str) for name in names)
+    # dwarf names are one or two syllables of onset, vowel and length mark
+    assert all(1 <= len(name) <= 10 for name in m.name_batch('Dwarf', 'male', 50))
+    # multi-syllable names are generated in full
+    assert any(len(name) > 10 for name in m.name_batch('elf', 'f', 50))
+
+
+def test_name_gen():
+    name = m.name_gen('human', 'f')
+    assert name.endswith(m.IPA_NOTE)
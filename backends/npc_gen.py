@@ -1,74 +1,73 @@
-"""Functions to load the npc generator"""
+"""Functions to load the npc generator.
 
-import random
+NPCs are generated in batches: for every trait, one vectorized draw picks a line of its table
+for all NPCs at once. Batches can be exported as CSV or JSON files."""
+import csv
+import io
+import json
+from collections import namedtuple
+from pathlib import Path
+from typing import List
 
+import numpy as np
 
-def generate_appearance():
-    with open('resources/npcgen/appearance.txt', 'r', encoding='utf-8') as f:
-        strings = f.readlines()
-    generated_appearance = random.choice(strings)
-    return generated_appearance
+from backends import corpora
 
+NPCGEN = Path('resources') / 'npcgen'
+APPEARANCE_FILE = NPCGEN / 'appearance.txt'
+HISTORY_FILE = NPCGEN / 'history.txt'
+TALENT_FILE = NPCGEN / 'talent.txt'
+MANNERISM_FILE = NPCGEN / 'mannerism.txt'
+INTERACTION_FILE = NPCGEN / 'interaction.txt'
+IDEALS_FILE = Path('resources') / 'ideals.txt'
+BONDS_FILE = Path('resources') / 'bonds.txt'
+FLAWS_FILE = Path('resources') / 'flaws.txt'
+MAX_NPCS = 200
+EXPORT_FORMATS = ('csv', 'json')
 
-def generate_history():
-    with open('resources/npcgen/history.txt', 'r', encoding='utf-8') as f:
-        strings = f.readlines()
-    generated_history = random.choice(strings)
-    return generated_history
+Npc = namedtuple('Npc',
+                 'history appearance talent mannerism interaction ideal bond flaw')
 
+TRAIT_FILES = Npc(HISTORY_FILE, APPEARANCE_FILE, TALENT_FILE, MANNERISM_FILE, INTERACTION_FILE,
+                  IDEALS_FILE, BONDS_FILE, FLAWS_FILE)
+FILES = tuple(TRAIT_FILES)
 
-def generate_talent():
-    with open('resources/npcgen/talent.txt', 'r', encoding='utf-8') as f:
-        strings = f.readlines()
-    generated_talent = random.choice(strings)
-    return generated_talent
+_rng = np.random.default_rng()
 
 
-def generate_mannerism():
-    with open('resources/npcgen/mannerism.txt', 'r', encoding='utf-8') as f:
-        strings = f.readlines()
-    generated_mannerism = random.choice(strings)
-    return generated_mannerism
+def npc_batch(amount: int = 1) -> List[Npc]:
+    """Generate 'amount' random NPCs, based on P.89 of the Dungeon Masters Guide."""
+    columns = []
+    for path in TRAIT_FILES:
+        lines = corpora.lines(path)
+        columns.append([lines[i] for i in _rng.integers(len(lines), size=amount)])
+    return [Npc(*traits) for traits in zip(*columns)]
 
 
-def generate_interaction():
-    with open('resources/npcgen/interaction.txt', 'r', encoding='utf-8') as f:
-        strings = f.readlines()
-    generated_interaction = random.choice(strings)
-    return generated_interaction
-
-
-def generate_ideal():
-    with open('resources/ideals.txt', 'r', encoding='utf-8') as f:
-        strings = f.readlines()
-    generated_ideal = random.choice(strings)
-    return generated_ideal
-
-
-def generate_bond():
-    with open('resources/bonds.txt', 'r', encoding='utf-8') as f:
-        strings = f.readlines()
-    generated_bond = random.choice(strings)
-    return generated_bond
-
-
-def generate_flaw():
-    with open('resources/flaws.txt', 'r', encoding='utf-8') as f:
-        strings = f.readlines()
-    generated_flaw = random.choice(strings)
-    return generated_flaw
+def describe(npc: Npc) -> str:
+    return f"**History:** {npc.history}\n  **Appearance:** {npc.appearance}\n  **Talent:** {npc.talent}\n  " \
+           f"**Mannerism:** {npc.mannerism}\n  **Interaction with others:** {npc.interaction}\n  " \
+           f"**Ideal:** {npc.ideal}\n  **Bond:** {npc.bond}\n **Flaw or secret:** {npc.flaw}\n "
 
 
 def final_output():
-    appearance = generate_appearance()
-    bond = generate_bond()
-    flaw = generate_flaw()
-    history = generate_history()
-    ideal = generate_ideal()
-    interaction = generate_interaction()
-    mannerism = generate_mannerism()
-    talent = generate_talent()
-    desc = f"**History:** {history}  **Appearance:** {appearance}  **Talent:** {talent}  **Mannerism:** " \
-           f"{mannerism}  **Interaction with others:** {interaction}  **Ideal:** {ideal}  **Bond:** {bond} " \
-           f"**Flaw or secret:** {flaw} "
-    return desc
+    return describe(npc_batch()[0])
+
+
+def export(npcs: List[Npc], file_format: str = 'csv') -> io.BytesIO:
+    """Write NPCs row by row into an in-memory file, as 'csv' or 'json', ready to attach to a message."""
+    buffer = io.BytesIO()
+    text = io.TextIOWrapper(buffer, encoding='utf-8', newline='')
+    if file_format == 'csv':
+        writer = csv.writer(text)
+        writer.writerow(Npc._fields)
+        writer.writerows(npcs)
+    else:
+        text.write('[')
+        for i, npc in enumerate(npcs):
+            text.write(',\n' if i else '\n')
+            json.dump(npc._asdict(), text, ensure_ascii=False)
+        text.write('\n]\n')
+    text.detach()  # flushes into the buffer without closing it
+    buffer.seek(0)
+    return buffer
@@ -0,0 +1,22 @@
+"""Pytests for npc_gen.py"""
+
+import csv
+import io
+import json
+
+import npc_gen as m
+
+
+def test_npc_batch():
+    npcs = m.npc_batch(50)
+    assert len(npcs) == 50
+    assert all(all(npc) for npc in npcs)
+    assert '**Flaw or secret:**' in m.final_output()
+
+
+def test_export():
+    npcs = m.npc_batch(10)
+    rows = list(csv.reader(io.TextIOWrapper(m.export(npcs, 'csv'), encoding='utf-8', newline='')))
+    assert rows[0] == list(m.Npc._fields)
+    assert [m.Npc(*row) for row in rows[1:]] == npcs
+    assert [m.Npc(**npc) for npc in json.load(m.export(npcs, 'json'))] == npcs
@@ -437,7 +437,7 @@ class __SRD:
         for file in data_path.iterdir():
             if file.name.endswith('.json'):
                 resource = file.stem.replace('5e-SRD-', '').lower()
-                log.debug(f'Loading SRD: {resource} from {file}')
+                log.debug('Loading SRD: %s from %s', resource, file)
                 with open(file, encoding='utf-8') as handle:
                     self.raw[resource] = json.load(handle)
 
@@ -457,10 +457,10 @@ class __SRD:
         try:
             target = self.raw[resource]
         except ValueError:
-            log.debug(f'Invalid search: resource \'{resource}\' not found.')
+            log.debug('Invalid search: resource \'%s\' not found.', resource)
             return []
         if attr not in target[0]:
-            log.debug(f'Invalid search: \'{resource}\' does not have attribute \'{attr}\'')
+            log.debug('Invalid search: \'%s\' does not have attribute \'%s\'', resource, attr)
             return []
         # do the search
         results = []
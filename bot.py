@@ -1,91 +1,254 @@
-import aiohttp
+from utils.startup import tracer  # first, so that the imports below are timed
+
 import datetime
 import logging
-import yaml
+import queue
 
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
+from time import perf_counter
+
+with tracer.phase('import yaml, aiohttp, discord.py'):
+    import aiohttp
+    import yaml
+
+    from discord import __version__ as discver, Activity, ActivityType, Intents, MemberCacheFlags
+    from discord.ext.commands import Bot, Context
 
-from discord import __version__ as discver, Activity, ActivityType
-from discord.ext.commands import Bot
+with tracer.phase('import sqlalchemy and database'):
+    from utils.database.db_functions import cache_prefixes, dispose_engine, reconcile_guilds, setup_engine
+    from utils.database import settings
+    from utils.database.writer import writer
 
-from utils.helpers import get_prefix
-from utils.database.db_functions import cache_prefixes
+with tracer.phase('import utils'):
+    from utils import command_masks, help_index, metrics
+    from utils.dispatch import Dispatcher
+    from utils.watchdog import LoopWatchdog
+    from utils.helpers import get_prefix, may_be_command
+    from utils.lazy import LazyExtension
+    from utils.pagination import PaginatorManager
 
 CONFIG_FILE = Path('config.yaml')
 LOGDIR = Path('logs')
+SLOW_QUERY_LOGGER = 'bot.database.slow'
+LOG_LEVELS = {'bot': 'DEBUG', 'discord': 'INFO'}  # DEBUG has far too much info for discord.py
+
+
+# Load configuration
+with tracer.phase('load config'), open(CONFIG_FILE, 'r') as yaml_file:
+    config = yaml.safe_load(yaml_file)
 
 
 # Set up logging
 
 
-def setup_logger() -> logging.Logger:
-    """Create and return the root Logger object for the bot."""
+class DeferredQueueHandler(QueueHandler):
+    """Queue records as they are, so that messages are formatted by the listener thread, not the event loop."""
+
+    def prepare(self, record):
+        return record
+
+
+def setup_logger(log_config: dict) -> QueueListener:
+    """Send the bot's and discord.py's logs through a queue to rotating files and the console.
+
+    Loggers only pass on records at or above their configured level, and records are formatted
+    in the listener's thread. Returns the listener, which must be stopped on shutdown."""
     LOGDIR.mkdir(exist_ok=True)
-    timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H-%M-%S')
-    logfile = LOGDIR / f'{timestamp}.log'
-    logger = logging.getLogger('bot')  # the actual logger instance
-    logger.setLevel(logging.DEBUG)  # capture all log levels
-    console_log = logging.StreamHandler()
-    console_log.setLevel(logging.DEBUG)  # log levels to be shown at the console
-    file_log = logging.FileHandler(logfile)
-    file_log.setLevel(logging.DEBUG)  # log levels to be written to file
     formatter = logging.Formatter('{asctime} - {name} - {levelname} - {message}', style='{')
-    console_log.setFormatter(formatter)
-    file_log.setFormatter(formatter)
-    logger.addHandler(console_log)
-    logger.addHandler(file_log)
-    # additionally, do some of the same configuration for the discord.py logger
-    discord_logger = logging.getLogger('discord')  # the discord.py logging instance
-    discord_logger.setLevel(logging.INFO)  # DEBUG has far too much info
-    discord_logger.addHandler(console_log)
-    discord_logger.addHandler(file_log)
-    return logger
+    max_bytes = log_config.get('max_bytes', 5_000_000)
+    backups = log_config.get('backups', 5)
+    console_log = logging.StreamHandler()
+    console_log.setLevel(log_config.get('console', 'DEBUG'))  # log levels to be shown at the console
+    file_log = RotatingFileHandler(LOGDIR / 'bot.log', maxBytes=max_bytes, backupCount=backups, encoding='utf-8')
+    # slow database statements go to a file of their own
+    slow_log = RotatingFileHandler(LOGDIR / 'slow-queries.log', maxBytes=max_bytes, backupCount=backups,
+                                   encoding='utf-8')
+    slow_log.addFilter(logging.Filter(SLOW_QUERY_LOGGER))
+    for handler in (console_log, file_log):
+        handler.addFilter(lambda record: not record.name.startswith(SLOW_QUERY_LOGGER))
+    for handler in (console_log, file_log, slow_log):
+        handler.setFormatter(formatter)
+    log_queue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    levels = {**LOG_LEVELS, **log_config.get('levels', {})}
+    for name, level in levels.items():
+        logging.getLogger(name).setLevel(level)
+    for name in ('bot', 'discord'):
+        logging.getLogger(name).addHandler(queue_handler)
+    listener = QueueListener(log_queue, console_log, file_log, slow_log, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+with tracer.phase('set up logging'):
+    log_listener = setup_logger(config.get('logging', {}))
+log = logging.getLogger('bot')
+
+
+class TimedContext(Context):
+    """Context that adds up the time its command spends sending messages."""
+    received = None  # when the message arrived, set by on_message
+    invoked = None  # when the command started, after its arguments were parsed
+    send_time = 0.0
+
+    async def send(self, *args, **kwargs):
+        start = perf_counter()
+        try:
+            return await super().send(*args, **kwargs)
+        finally:
+            self.send_time += perf_counter() - start
 
 
-log = setup_logger()
+class TavernBot(Bot):
+    async def close(self):
+        self.watchdog.stop()
+        self.paginators.close()
+        await writer.close()  # write queued database changes before the event loop stops
+        if self.metrics_runner is not None:
+            await self.metrics_runner.cleanup()
+        await super().close()
 
+    # cogs and commands change when extensions are loaded or unloaded; the rendered help is then outdated
+    def add_cog(self, cog):
+        super().add_cog(cog)
+        help_index.invalidate()
+
+    def remove_cog(self, name):
+        super().remove_cog(name)
+        help_index.invalidate()
+
+    def add_command(self, command):
+        super().add_command(command)
+        help_index.invalidate()
+
+    def remove_command(self, name):
+        help_index.invalidate()
+        return super().remove_command(name)
 
-# Load configuration
-with open(CONFIG_FILE, 'r') as yaml_file:
-    config = yaml.safe_load(yaml_file)
 
 # Use configuration to start the bot
 # TODO: dynamic per-server prefixes using utils.helpers.prefix
-bot = Bot(
+# member join and leave events keep the member counts of ;status and the Tavern greetings going
+intents = Intents.default()
+intents.members = config.get('members_intent', True)
+member_cache = {}
+if config.get('member_cache') == 'light':
+    # no member lists are requested or kept; member counts in ;status come from utils.counters
+    member_cache = {'member_cache_flags': MemberCacheFlags.none(), 'chunk_guilds_at_startup': False}
+bot = TavernBot(
     activity=Activity(
         name=f'{config["prefix"]}help | D&D 5e',
         type=ActivityType.watching
     ),
     command_prefix=get_prefix,
-    pm_help=True
+    pm_help=True,
+    intents=intents,
+    **member_cache
 )
 
 bot.config = config  # assign configuration to a bot attribute for access from cogs
+bot.dispatcher = Dispatcher()  # decides where blocking work from cogs runs
+# one database engine and connection pool for the whole bot
+with tracer.phase('create database engine'):
+    setup_engine(slow_query=config.get('database', {}).get('slow_query_ms', 100) / 1000)
 bot.remove_command('help')
 bot.start_time = datetime.datetime.now()
+bot.metrics_runner = None
+bot.caches_loaded = False  # settings and prefixes are loaded on the first connect only
+bot.paginators = PaginatorManager(bot)  # reaction paginators of all cogs
+# logs what the event loop is doing when it is stuck for longer than the threshold
+bot.watchdog = LoopWatchdog(threshold=config.get('watchdog', {}).get('threshold_ms', 250) / 1000)
 
 
 @bot.event
 async def on_connect():
     bot.aiohttp_session = aiohttp.ClientSession()  # assign separate ClientSession object for outside requests
-    await cache_prefixes()
+    bot.watchdog.start()
+    if not tracer.reported:
+        tracer.mark('connected to Discord')
+    # on_connect also runs after every reconnect. The caches are written through and the database may
+    # still lack queued changes, so reloading them then would bring back old values.
+    if not bot.caches_loaded:
+        with tracer.phase('cache settings and prefixes'):
+            await settings.cache_settings()  # also brings the database schema up to date
+            command_masks.compile_all(bot)
+            await cache_prefixes()
+        bot.caches_loaded = True
+    if bot.metrics_runner is None and config.get('metrics', {}).get('port'):
+        bot.metrics_runner = await metrics.start_server(port=config['metrics']['port'])
+
+
+@bot.check
+def command_enabled(ctx):
+    """Commands can be disabled per server or channel with ;disable and ;restrict."""
+    return command_masks.allowed(ctx.guild and ctx.guild.id, ctx.channel.id, ctx.command.qualified_name)
+
+
+@bot.event
+async def on_message(message):
+    if message.author.bot or not may_be_command(bot, message):
+        return  # most messages are chatter, skip the command pipeline for them
+    received = perf_counter()
+    ctx = await bot.get_context(message, cls=TimedContext)
+    ctx.received = received
+    await bot.invoke(ctx)
+
+
+@bot.before_invoke
+async def start_command_timer(ctx):
+    ctx.invoked = perf_counter()
+
+
+@bot.after_invoke
+async def record_command_time(ctx):
+    """Split the time of every command into parsing, its own work, and sending messages."""
+    done = perf_counter()
+    invoked = getattr(ctx, 'invoked', None) or done
+    received = getattr(ctx, 'received', None) or invoked
+    send_time = getattr(ctx, 'send_time', 0.0)
+    name = ctx.command.qualified_name
+    metrics.command_times.observe((name, 'parse'), invoked - received)
+    metrics.command_times.observe((name, 'compute'), done - invoked - send_time)
+    metrics.command_times.observe((name, 'send'), send_time)
+    metrics.command_times.observe((name, 'total'), done - received)
 
 
 @bot.event
 async def on_ready():
-    log.info(f"Connected as {bot.user}, using discord.py {discver}")
+    log.info('Connected as %s, using discord.py %s', bot.user, discver)
+    await writer.flush()
+    # joins and removals while offline
+    with tracer.phase('reconcile guilds'):
+        added, removed = await reconcile_guilds((guild.id for guild in bot.guilds), config['prefix'])
+    for guild_id in removed:
+        settings.forget_guild(guild_id)
+        command_masks.compile_guild(bot, guild_id)
+    if not tracer.reported:  # on_ready also runs after reconnecting
+        tracer.mark('ready')
+        tracer.reported = True
+        log.info(tracer.timeline())
 
 
 def main():
     """Load cogs, configuration, and start the bot."""
+    lazy_extensions = bot.config.get('lazy_extensions') or ()
     for extension in bot.config['load_extensions']:
         try:
-            log.debug(f'Loading extension: {extension}')
-            bot.load_extension(extension)
+            log.debug('Loading extension: %s', extension)
+            with tracer.phase(f'load extension {extension}'):
+                if extension in lazy_extensions:  # only stubs now, the cog is loaded when first used
+                    LazyExtension(bot, extension).register()
+                else:
+                    bot.load_extension(extension)
         except:  # noqa: E722
-            log.exception(f'Failed to load extension: {extension}')
+            log.exception('Failed to load extension: %s', extension)
 
+    tracer.mark('connecting to Discord')
     bot.run(config['token'])
+    bot.dispatcher.shutdown()
+    dispose_engine()
+    log_listener.stop()  # writes out the queued records
 
 
 if __name__ == '__main__':
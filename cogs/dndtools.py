@@ -1,7 +1,11 @@
+import asyncio
 import json
 import logging
 
+from backends.combat_sim import final_simulation, party_stats, simulate, stats_from_srd, stats_from_xp
 from backends.encounter_gen import calculate_xp, encounter_gen, final_encounter
+from backends.srd_json import srd
+from utils.dispatch import PROCESS, THREAD
 
 from discord.ext.commands import Cog, command
 from discord import Embed, Colour
@@ -9,6 +13,11 @@ from discord import Embed, Colour
 
 log = logging.getLogger('bot.' + __name__)
 
+DIFFICULTIES = ['easy', 'medium', 'difficult', 'deadly']
+ENVIRONMENTS = ['city', 'dungeon', 'forest', 'nature', 'other plane', 'underground', 'water']
+SIMULATION_TRIALS = 5000
+SIMULATION_TIMEOUT = 10  # seconds, hard limit for a single ;simulate request
+
 
 class DndTools(Cog, name='D&D Tools'):
     """Various D&D tools."""
@@ -36,39 +45,73 @@ class DndTools(Cog, name='D&D Tools'):
         pp = total
         return await ctx.send(f"Recalculated your currency into: {str(cp)}cp, {str(sp)}sp, {str(gp)}gp and {str(pp)}pp")
 
-    @command(name='encounter')
-    async def encounter_command(self, ctx, psize, plevel, difficulty, environment=None, dm=None):
-        """Generates a random encounter based on the users inputs.
-        The user can input: the size of the party, the average level of the party,
-        the difficulty of the encounter and the environment it takes place in."""
-        difficulties = ['easy', 'medium', 'difficult', 'deadly']
-        environments = ['city', 'dungeon', 'forest', 'nature', 'other plane', 'underground', 'water']
+    @staticmethod
+    def parse_party(psize, plevel, difficulty, environment):
+        """Validate the party arguments shared by the encounter commands.
+
+        Returns (psize, plevel, difficulty level, None) or (None, None, None, error message)."""
         try:
             psize = int(psize)
             plevel = int(plevel)
         except ValueError:
-            return await ctx.send('Party size and level must be numbers.')
+            return None, None, None, 'Party size and level must be numbers.'
         if psize < 1 or psize > 10:
-            return await ctx.send('Party size must be a number between 1 and 10.')
+            return None, None, None, 'Party size must be a number between 1 and 10.'
         if plevel < 1 or plevel > 20:
-            return await ctx.send('Party level must be a number between 1 and 20.')
-        if difficulty in difficulties:
-            diff_level = difficulties.index(difficulty) + 1
-        else:
-            return await ctx.send(f"\"{difficulty}\" is not a valid difficulty. Please choose one of: "
-                                  f"**{' - '.join(difficulties)}**")
-        if environment is not None:
-            if environment not in environments:
-                return await ctx.send(f"\"{environment}\" is not a valid environment. Please choose one of: "
-                                      f"**{' - '.join(environments)}**")
+            return None, None, None, 'Party level must be a number between 1 and 20.'
+        if difficulty not in DIFFICULTIES:
+            return None, None, None, f"\"{difficulty}\" is not a valid difficulty. Please choose one of: " \
+                                     f"**{' - '.join(DIFFICULTIES)}**"
+        if environment is not None and environment not in ENVIRONMENTS:
+            return None, None, None, f"\"{environment}\" is not a valid environment. Please choose one of: " \
+                                     f"**{' - '.join(ENVIRONMENTS)}**"
+        return psize, plevel, DIFFICULTIES.index(difficulty) + 1, None
+
+    @command(name='encounter')
+    async def encounter_command(self, ctx, psize, plevel, difficulty, environment=None, dm=None):
+        """Generates a random encounter based on the users inputs.
+        The user can input: the size of the party, the average level of the party,
+        the difficulty of the encounter and the environment it takes place in."""
+        psize, plevel, diff_level, error = self.parse_party(psize, plevel, difficulty, environment)
+        if error is not None:
+            return await ctx.send(error)
         xp = calculate_xp(plevel, psize, diff_level)
-        encounter = encounter_gen(environment, xp)
+        encounter = await self.bot.dispatcher.run(encounter_gen, environment, xp)
         final = final_encounter(encounter, xp)
         if dm is not None and dm.lower() in ('dm', 'pm'):
             await ctx.author.send(final)
             return await ctx.send("Sent results by DM.")
         return await ctx.send(final)
 
+    @command(name='simulate')
+    async def simulate_command(self, ctx, psize, plevel, difficulty, environment=None):
+        """Generates a random encounter and simulates the fight thousands of times.
+        Takes the same inputs as the encounter command, and estimates how likely the party is
+        to be knocked out and how many rounds the fight will take."""
+        psize, plevel, diff_level, error = self.parse_party(psize, plevel, difficulty, environment)
+        if error is not None:
+            return await ctx.send(error)
+        xp = calculate_xp(plevel, psize, diff_level)
+        encounter = await self.bot.dispatcher.run(encounter_gen, environment, xp)
+        if not encounter:
+            return await ctx.send('Could not generate an encounter for this party.')
+        monsters = []
+        for row in encounter:
+            matches = await self.bot.dispatcher.run(srd.search, 'monsters', 'name', row[0], cost=THREAD)
+            matches = [m for m in matches if m['name'].lower() == row[0].lower()]
+            if matches:
+                monsters.append(stats_from_srd(matches[0], int(row[4])))
+            else:
+                monsters.append(stats_from_xp(row[0].capitalize(), int(row[4])))
+        log.debug('simulating %s level %s adventurers against %s', psize, plevel, [m.name for m in monsters])
+        try:
+            result = await self.bot.dispatcher.run(simulate, party_stats(plevel, psize), monsters,
+                                                   trials=SIMULATION_TRIALS, time_budget=SIMULATION_TIMEOUT / 2,
+                                                   cost=PROCESS, timeout=SIMULATION_TIMEOUT)
+        except asyncio.TimeoutError:
+            return await ctx.send('The simulation took too long, please try again later.')
+        return await ctx.send(final_simulation(result, monsters))
+
     @command('homebrew')
     async def homebrew_lookup(self, ctx, name):
         """Lookup homebrew content from dandwiki."""
@@ -79,7 +122,7 @@ class DndTools(Cog, name='D&D Tools'):
             "search": name
         }
         async with self.bot.aiohttp_session.get(self.homebrew_url, params=params) as resp:
-            log.debug(f"Issued homebrew API request to {resp.url}")
+            log.debug("Issued homebrew API request to %s", resp.url)
             data = json.loads(await resp.text())
         links = dict(zip(data[1], data[3]))
         link = []
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import math
 
@@ -17,19 +18,23 @@ class CommandErrorHandler(commands.Cog, name='ErrorHandler'):
     async def on_command_error(self, ctx, error):
         """Fires when a command throws an error."""
         if isinstance(error, commands.UserInputError):
-            log.debug(f'{ctx.author} used {ctx.command} but arguments passed were invalid.')
+            log.debug('%s used %s but arguments passed were invalid.', ctx.author, ctx.command)
             await ctx.send("Invalid arguments! please try again.")
 
         elif isinstance(error, commands.CommandOnCooldown):
-            log.debug(f'{ctx.author} used {ctx.command} but was on cooldown.')
+            log.debug('%s used %s but was on cooldown.', ctx.author, ctx.command)
             remaining_minutes, remaining_seconds = divmod(error.retry_after, 60)
             return await ctx.send(
                 "This command is on cooldown, please retry in "
                 f"{int(remaining_minutes)} minutes {math.ceil(remaining_seconds)} seconds."
             )
 
+        elif isinstance(error, commands.CommandInvokeError) and isinstance(error.original, asyncio.TimeoutError):
+            log.debug('%s used %s but it took too long.', ctx.author, ctx.command)
+            await ctx.send("That took too long, please try again later.")
+
         elif isinstance(error, commands.TooManyArguments):
-            log.debug(f'{ctx.author} used {ctx.command} but arguments passed were many.')
+            log.debug('%s used %s but arguments passed were many.', ctx.author, ctx.command)
             await ctx.send("Too many arguments were passed! Please try again.")
 
         else:
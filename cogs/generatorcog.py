@@ -1,15 +1,21 @@
 import logging
-import random
 from pathlib import Path
 
-from backends.npc_gen import final_output
-from backends.name_gen import name_gen
+from backends import corpora
+from backends.npc_gen import EXPORT_FORMATS, FILES as NPC_FILES, MAX_NPCS, describe, export, npc_batch
+from backends.markov import generate_batch, models
+from backends.name_gen import IPA_NOTE, MAX_NAMES, name_batch, races
 
-from discord import Colour, Embed
+from discord import Colour, Embed, File
 from discord.ext.commands import Cog, command
 
+from utils.database import settings
+from utils.dispatch import THREAD
+
 log = logging.getLogger('bot.' + __name__)
 
+EMBED_NPCS = 3  # larger batches of npcs are sent as a file
+
 r = Path('resources')
 paths = {
     "bond": r / 'bonds.txt',  # list of bonds
@@ -28,12 +34,13 @@ class GeneratorCog(Cog, name='Generator'):
 
     def __init__(self, bot):
         self.bot = bot
+        corpora.load(*paths.values(), *NPC_FILES)
 
     @command(name='generate')
     async def generator_command(self, ctx, generate=None, amount: int = None, dm=None):
         """All of the generate commands that are used to generate things, such as:
         characters, NPCs and names."""
-        log.debug(f'generate request with type={generate} and amount={amount}')
+        log.debug('generate request with type=%s and amount=%s', generate, amount)
         generator_embed = Embed(colour=Colour.blurple())
         commands = ['backstory', 'bond', 'flaw', 'ideal', 'quest', 'townname', 'trait']
         commands.sort()
@@ -50,10 +57,8 @@ class GeneratorCog(Cog, name='Generator'):
             return await ctx.send(embed=generator_embed)
 
         final = str.casefold(generate)
-        with open(paths[final], 'r', encoding='utf-8') as f:
-            strings = f.readlines()
         if amount is None:
-            return await ctx.send(random.choice(strings))
+            return await ctx.send(corpora.choice(paths[final]))
         try:
             iamount = int(amount)
         except ValueError:
@@ -61,7 +66,9 @@ class GeneratorCog(Cog, name='Generator'):
         else:
             if not 1 < iamount <= 5:
                 return await ctx.send(f'Please choose a number of {final}s between 2 and 5.')
-            message = ''.join(random.choices(strings, k=iamount))
+            message = '\n'.join(corpora.choices(paths[final], iamount))
+        if dm is None and ctx.guild is not None and settings.get(ctx.guild.id, 'dm_results'):
+            dm = 'dm'
         if dm is not None:
             if dm is not None and dm.lower() in ('dm', 'pm'):
                 await ctx.author.send(message)
@@ -69,18 +76,57 @@ class GeneratorCog(Cog, name='Generator'):
         await ctx.send(message)
 
     @command(name='npc')
-    async def npc_command(self, ctx):
-        """Generates a random npc, based on P.89 of the Dungeon Masters Guide."""
-        desc = final_output()
-        embed = Embed(colour=Colour.blurple())
-        embed.add_field(name='Randomly generated npc.', value=desc, inline=True)
-        return await ctx.send(embed=embed)
+    async def npc_command(self, ctx, amount: int = 1, file_format=None):
+        """Generates random npcs, based on P.89 of the Dungeon Masters Guide.
+        A few npcs are shown in the chat; more, or any amount followed by csv or json, are sent as a file.
+        For example: ;npc 100 json"""
+        if not 1 <= amount <= MAX_NPCS:
+            return await ctx.send(f'Please choose a number of npcs between 1 and {MAX_NPCS}.')
+        if file_format is not None and file_format.lower() not in EXPORT_FORMATS:
+            return await ctx.send(f'Please choose a file format from **{" - ".join(EXPORT_FORMATS)}**.')
+        npcs = await self.bot.dispatcher.run(npc_batch, amount)
+        if file_format is None and amount <= EMBED_NPCS:
+            embed = Embed(colour=Colour.blurple())
+            for npc in npcs:
+                embed.add_field(name='Randomly generated npc.', value=describe(npc), inline=True)
+            return await ctx.send(embed=embed)
+        file_format = (file_format or 'csv').lower()
+        buffer = await self.bot.dispatcher.run(export, npcs, file_format)
+        return await ctx.send(f'Generated {amount} npcs.', file=File(buffer, filename=f'npcs.{file_format}'))
 
     @command(name='name')
-    async def name_generator(self, ctx, race, gender):
-        """Generates a random name for the race and gender the user submitted."""
-        result = name_gen(race, gender)
-        return await ctx.send(result)
+    async def name_generator(self, ctx, race, gender, amount: int = 1):
+        """Generates random names for the race and gender the user submitted.
+        For example: ;name elf f 10 generates 10 female elf names."""
+        if race.lower() not in races or gender.lower()[0] not in ('m', 'f'):
+            return await ctx.send(f'Please choose a race from **{" - ".join(races)}** and a gender (m or f).')
+        if not 1 <= amount <= MAX_NAMES:
+            return await ctx.send(f'Please choose a number of names between 1 and {MAX_NAMES}.')
+        names = await self.bot.dispatcher.run(name_batch, race, gender, amount)
+        message = ''
+        for name in names:
+            if len(message) + len(name) > 1900:
+                await ctx.send(message)
+                message = ''
+            message += name + '\n'
+        return await ctx.send(message + IPA_NOTE)
+
+    @command(name='invent')
+    async def invent_command(self, ctx, kind=None, amount: int = 1):
+        """Invents new names that aren't in any of the name lists, such as:
+        town names or names for one of the races. For example: ;invent townname 5"""
+        if kind is None or kind.lower() not in models:
+            kinds = ' - '.join(sorted(models))
+            return await ctx.send(f'Use ;invent {{kind}} {{optional amount}} with one of: **{kinds}**')
+        if not 1 <= amount <= MAX_NAMES:
+            return await ctx.send(f'Please choose a number of names between 1 and {MAX_NAMES}.')
+        names = await self.bot.dispatcher.run(generate_batch, models[kind.lower()], amount, cost=THREAD)
+        if not names:
+            return await ctx.send(f'I couldn\'t come up with any new {kind.lower()} names.')
+        message = '\n'.join(names)
+        if kind.lower() != 'townname':
+            message += '\n' + IPA_NOTE
+        return await ctx.send(message[:2000])
 
 
 def setup(bot):
@@ -6,6 +6,8 @@ from collections import deque
 import discord
 from discord.ext import commands
 
+from utils.database import settings
+
 log = logging.getLogger('bot.' + __name__)
 
 
@@ -40,14 +42,15 @@ class DndReddit(commands.Cog, name='D&D Reddit'):
         Gets a post from r/dndmemes by default.
         """
         subreddit = subreddit.lower()
+        subreddits = (ctx.guild and settings.get(ctx.guild.id, 'subreddits')) or self.subreddits
 
-        if subreddit not in self.subreddits:
+        if subreddit not in subreddits:
             embed = discord.Embed()
             embed.title = 'Please choose from this list of subreddits:'
             embed.colour = discord.Colour.blue()
             embed.description = '```'
 
-            for sr in self.subreddits:
+            for sr in subreddits:
                 embed.description += sr + '\n'
 
             embed.description += '```'
@@ -1,14 +1,16 @@
 import logging
 import random
-from functools import partial
 
 from discord import Colour, Embed
 from discord.ext.commands import Cog, command
 
-from utils.helpers import roll_dice
+from utils import dice, dice_odds
+from utils.dispatch import THREAD
 
 log = logging.getLogger('bot.' + __name__)
 
+DISPLAY_DICE = 50  # bigger pools are summarised by face instead of listing every die
+
 
 class RollingCog(Cog, name='Dice Rolling'):
     """Rolls dice. Allows for other dice-based outputs to be received."""
@@ -30,7 +32,7 @@ class RollingCog(Cog, name='Dice Rolling'):
             return await ctx.send(f'{amount} is not a valid number of ability scores to generate.')
         if not 1 <= iamount <= 10:
             return await ctx.send(f'Please choose a number of ability scores between 2 and 10.')
-        log.debug(f'roll ability scores with amount={amount}')
+        log.debug('roll ability scores with amount=%s', amount)
         for _ in range(int(amount)):
             rolls = random.choices(range(1, 7), k=4)
             total = sum(rolls) - min(rolls)
@@ -47,23 +49,40 @@ class RollingCog(Cog, name='Dice Rolling'):
                 return await ctx.author.send(embed=rngstat_embed)
         await ctx.send(embed=rngstat_embed)
 
+    @staticmethod
+    def describe_roll(result) -> str:
+        """Format one rolled expression as a line of the roll embed, with dropped dice struck out."""
+        rolled = []
+        for die in result.dice:
+            face_counts = die.face_counts
+            if face_counts is None and len(die.kept) + len(die.dropped) > DISPLAY_DICE:
+                face_counts = [die.kept.count(face) for face in range(1, max(die.kept, default=0) + 1)]
+            if face_counts is None:
+                faces = [str(face) for face in die.kept] + [f'~~{face}~~' for face in die.dropped]
+            else:  # too many dice to show one by one, show how many dice rolled each face instead
+                faces = [f'{count}× {face}' for face, count in enumerate(face_counts, start=1) if count]
+                if len(faces) > DISPLAY_DICE:
+                    faces = [f'{sum(face_counts)} dice kept']
+            rolled.append(f'{die.notation} ({", ".join(faces)})')
+        line = f'**{result.expression}**: {" ".join(rolled)} = **__{result.total}__**'
+        if result.success is not None:
+            line += ' Success!' if result.success else ' Failure.'
+        return line
+
     @command(name='roll')
     async def roll_command(self, ctx, *, request='1d20'):
-        """Roll a numerous amount of dices. Format like: ;roll {dicetype} {modifier}.
-        For example: ;roll 4d10 3d6 + 7. Multiple dices can be given."""
-
+        """Roll dice using dice notation. Format like: ;roll {dice} {modifier}.
+        For example: ;roll 4d10 3d6 + 7. Multiple dice can be given.
+        Also supports keeping/dropping dice (4d6kh3, 2d20kl1), exploding dice (8d6!),
+        rerolls (2d6r1, 4d6ro<3), arithmetic and DCs (1d20 + 5 dc 15)."""
         try:
-            values = await self.bot.loop.run_in_executor(None, partial(roll_dice, request))
-        except TypeError as InvalidDice:
-            return await ctx.send(InvalidDice)
-        desc = ''
-        total_roll = 0
-        for i, x in enumerate(values):
-            total = values[x][0] + values[x][1]
-            total_roll += sum(total)
-            desc += f'**{len(values[x][0])} D{x}**: {values[x][0]}' \
-                f'{" + **" + ", ".join([str(val) for val in values[x][1]]) + "**" if values[x][1] else ""}' \
-                f' = **__{sum(total)}__**\n'
+            results = await self.bot.dispatcher.run(dice.roll, request, cost=THREAD)
+        except dice.DiceError as invalid_dice:
+            return await ctx.send(invalid_dice)
+        desc = '\n'.join(self.describe_roll(result) for result in results)
+        if len(desc) > 2048:
+            desc = desc[:2045] + '...'
+        total_roll = sum(result.total for result in results)
         roll_embed = Embed(
             title=f'🎲 {ctx.author} rolled! 🎲',
             description=desc,
@@ -72,6 +91,27 @@ class RollingCog(Cog, name='Dice Rolling'):
         roll_embed.set_footer(text=f'Total of all dice: {total_roll} 🎲')
         return await ctx.send(embed=roll_embed)
 
+    @command(name='odds')
+    async def odds_command(self, ctx, *, request):
+        """Calculate the exact odds of a dice roll. Format like: ;odds {dice}.
+        For example: ;odds 8d6 shows the average and spread of the total,
+        ;odds 1d20 + 7 dc 15 shows the chance to reach DC 15."""
+        try:
+            results = await self.bot.dispatcher.run(dice_odds.odds, request, cost=THREAD)
+        except dice.DiceError as invalid_dice:
+            return await ctx.send(invalid_dice)
+        odds_embed = Embed(title='🎲 Dice odds 🎲', colour=Colour.blurple())
+        for result in results[:25]:  # an embed can hold 25 fields
+            percentiles = ', '.join(f'{percent}%: {total}' for percent, total in result.percentiles.items())
+            value = f'Average **{result.mean:.2f}** (standard deviation {result.stdev:.2f})\n' \
+                f'Range {result.minimum} to {result.maximum}\n' \
+                f'Percentiles: {percentiles}'
+            if result.chance is not None:
+                value = f'Chance of success: **{result.chance:.2%}**\n' + value
+            odds_embed.add_field(name=result.expression, value=value, inline=False)
+        odds_embed.set_footer(text='Use ;odds {dice} dc {number} to get the chance of beating a DC.')
+        return await ctx.send(embed=odds_embed)
+
 
 def setup(bot):
     bot.add_cog(RollingCog(bot))
@@ -1,14 +1,16 @@
 import datetime
 import logging
 
-from sqlalchemy import update
-
-from discord import Colour, Embed
-from discord.ext.commands import Bot, Cog, command, has_permissions, MissingPermissions
+from discord import Colour, Embed, TextChannel
+from discord.ext.commands import Bot, Cog, command, guild_only, has_permissions, MissingPermissions
 
+from utils import command_masks, help_index, metrics
+from utils.counters import GuildCounters
 from utils.checks import is_admin
-from utils.database.db_functions import db_edit, cache_prefixes
-import utils.database as tables
+from utils.database import settings
+from utils.database.db_functions import reconcile_guilds, statement_times
+from utils.database.writer import queue_guild_removal, queue_prefix, writer
+from utils.helpers import get_prefix
 
 log = logging.getLogger('bot.' + __name__)
 
@@ -18,25 +20,36 @@ class SpecialCog(Cog, name='Special'):
     def __init__(self, bot: Bot):
         self.bot = bot
         self.config = self.bot.config
+        self.counters = GuildCounters()  # guild and member totals for ;status
+        if bot.is_ready():  # the extension was reloaded
+            self.counters.reset(bot.guilds)
+
+    @Cog.listener()
+    async def on_ready(self):
+        self.counters.reset(self.bot.guilds)
+
+    @Cog.listener()
+    async def on_member_join(self, member):
+        self.counters.member_joined(member.guild)
+
+    @Cog.listener()
+    async def on_member_remove(self, member):
+        self.counters.member_left(member.guild)
 
     @Cog.listener()
     async def on_guild_join(self, guild):
-        code = tables.guild_settings.insert().values()
-        data = {
-            'guild_id': guild.id,
-            'prefix': self.config["prefix"]
-        }
-        await db_edit(code, data)
+        self.counters.add_guild(guild)
+        queue_prefix(guild.id, self.config['prefix'])
         tavern_support = self.bot.get_guild(546007130902233088)
         channel = tavern_support.get_channel(573945620482490378)
         await channel.send(f'**{guild.name}** guild has invited the Tavern Bot.')
 
     @Cog.listener()
     async def on_guild_remove(self, guild):
-        table = tables.guild_settings
-        guild_id = guild.id
-        code = table.delete().where(table.c.guild_id == guild_id)
-        await db_edit(code)
+        self.counters.remove_guild(guild)
+        queue_guild_removal(guild.id)
+        settings.forget_guild(guild.id)
+        command_masks.compile_guild(self.bot, guild.id)
         tavern_support = self.bot.get_guild(546007130902233088)
         channel = tavern_support.get_channel(573945620482490378)
         await channel.send(f'**{guild.name}** guild has removed the Tavern Bot.')
@@ -58,13 +71,16 @@ class SpecialCog(Cog, name='Special'):
         status_embed = Embed(
             title='Status',
             colour=Colour.blurple())
-        members = len(list(self.bot.get_all_members()))
         uptime = datetime.datetime.now() - self.bot.start_time
         uptime = datetime.timedelta(days=uptime.days, seconds=uptime.seconds)
         date = 'Created on 18-11-2018'
+        lag = self.bot.watchdog.percentiles()
+        lag_text = ', '.join(f'{"max" if percent == 100 else f"p{percent}"} {seconds * 1000:.1f}ms'
+                             for percent, seconds in lag.items()) or 'not measured yet'
         status_embed.description = '\n'.join(
-            [f'Bot up and running in {len(self.bot.guilds)} guilds with {members} members.',
-             f'Uptime: {uptime}\n{date}'
+            [f'Bot up and running in {self.counters.guilds} guilds with {self.counters.members} members.',
+             f'Uptime: {uptime}\n{date}',
+             f'Event loop lag (last 5 minutes): {lag_text}'
              ]
         )
         status_embed.set_footer(text='Use ;help to get a list of available commands.')
@@ -84,100 +100,184 @@ class SpecialCog(Cog, name='Special'):
     @command(name='dbappend', hidden=True)
     async def append_to_db(self, ctx):
         """
-        Ensures all guilds that the Bot is currently in are added to the Guilds database..
+        Ensures all guilds that the Bot is currently in are added to the Guilds database,
+        and removes the guilds it has left.
         """
-        guilds_added = 0
-        db_code = tables.guild_settings.insert().values()
-        for g in self.bot.guilds:
-            data = {
-                'guild_id': g.id,
-                'prefix': self.config['prefix']
-            }
-            db_is_edited = await db_edit(db_code, data)
-            if db_is_edited:
-                guilds_added += 1
-            else:
-                pass  # An error is already passed by the db_edit function
-        await ctx.send(f'{guilds_added} guilds added to the Guilds database.')
+        await writer.flush()
+        added, removed = await reconcile_guilds((g.id for g in self.bot.guilds), self.config['prefix'])
+        for guild_id in removed:
+            settings.forget_guild(guild_id)
+            command_masks.compile_guild(self.bot, guild_id)
+        await ctx.send(f'{len(added)} guilds added to and {len(removed)} guilds removed from the Guilds database.')
 
+    @guild_only()
     @has_permissions(manage_guild=True)
     @command(name='prefix')
     async def change_prefix(self, ctx, new_prefix):
         """Use this command to change the prefix of your bot."""
-        table = tables.guild_settings
-        data = {'prefix': new_prefix}
-        db_is_edited = await db_edit(update(table).where(table.c.guild_id == ctx.guild.id).values(), data)
-        if db_is_edited:
-            await cache_prefixes()
-            await ctx.send(f"Prefix has been changed to {new_prefix}")
-        else:
-            await ctx.send(f"Prefix could not be changed to {new_prefix}")
+        try:
+            settings.set_value(ctx.guild.id, 'prefix', settings.parse('prefix', new_prefix, self.bot))
+        except settings.SettingError as error:
+            return await ctx.send(f"Prefix could not be changed to {new_prefix}: {error}")
+        await ctx.send(f"Prefix has been changed to {new_prefix}")
 
     @change_prefix.error
     async def on_change_prefix_error(self, ctx, error):
         if isinstance(error, MissingPermissions):
             return await ctx.send(f'Could not change the prefix for the server.\n{error}')
 
+    @guild_only()
+    @has_permissions(manage_guild=True)
+    @command(name='settings')
+    async def settings_command(self, ctx, key: str = None, *, value: str = None):
+        """View or change the settings of this server.
+        For example: ;settings dm_results yes, or ;settings disabled_commands reset"""
+        if key is None or key not in settings.SETTINGS:
+            embed = Embed(title='Server settings', colour=0x68c290)
+            for name, setting in settings.SETTINGS.items():
+                current = settings.get(ctx.guild.id, name)
+                if isinstance(current, dict):
+                    current = '; '.join(f'{key}: {", ".join(map(str, sorted(values)))}'
+                                        for key, values in current.items()) or 'none'
+                elif isinstance(current, (frozenset, tuple)):
+                    current = ', '.join(sorted(current)) or 'none'
+                embed.add_field(name=name, value=f'{setting.description}\nCurrently: **{current}**', inline=False)
+            embed.set_footer(text='Use ;settings {setting} {value} to change one, or {value} reset to go back.')
+            return await ctx.send(embed=embed)
+        if value is None:
+            return await ctx.send(f'{key} is currently **{settings.get(ctx.guild.id, key)}**')
+        try:
+            if value.lower() == 'reset':
+                settings.reset(ctx.guild.id, key)
+            else:
+                settings.set_value(ctx.guild.id, key, settings.parse(key, value, self.bot))
+        except settings.SettingError as error:
+            return await ctx.send(str(error))
+        command_masks.compile_guild(self.bot, ctx.guild.id)
+        await ctx.send(f'{key} has been changed.')
+
+    @settings_command.error
+    async def on_settings_error(self, ctx, error):
+        if isinstance(error, MissingPermissions):
+            return await ctx.send(f'Could not change the settings for the server.\n{error}')
+
+    @guild_only()
+    @has_permissions(manage_guild=True)
+    @command(name='disable')
+    async def disable_command(self, ctx, name: str, channel: TextChannel = None):
+        """Disable a command in this server, or in one channel.
+        For example: ;disable reddit, or ;disable reddit #general"""
+        name = command_masks.maskable(self.bot, name)
+        if name is None:
+            return await ctx.send('That command doesn\'t exist or can\'t be disabled.')
+        if channel is None:
+            disabled = settings.get(ctx.guild.id, 'disabled_commands') | {name}
+            settings.set_value(ctx.guild.id, 'disabled_commands', disabled)
+        else:
+            channels = dict(settings.get(ctx.guild.id, 'channel_disabled'))
+            channels[channel.id] = channels.get(channel.id, frozenset()) | {name}
+            settings.set_value(ctx.guild.id, 'channel_disabled', channels)
+        command_masks.compile_guild(self.bot, ctx.guild.id)
+        await ctx.send(f'{name} has been disabled{f" in {channel.mention}" if channel else ""}.')
+
+    @guild_only()
+    @has_permissions(manage_guild=True)
+    @command(name='enable')
+    async def enable_command(self, ctx, name: str, channel: TextChannel = None):
+        """Enable a command that was disabled in this server, or in one channel.
+        For example: ;enable reddit, or ;enable reddit #general"""
+        name = command_masks.maskable(self.bot, name)
+        if name is None:
+            return await ctx.send('That command doesn\'t exist.')
+        if channel is None:
+            disabled = settings.get(ctx.guild.id, 'disabled_commands') - {name}
+            settings.set_value(ctx.guild.id, 'disabled_commands', disabled)
+        else:
+            channels = dict(settings.get(ctx.guild.id, 'channel_disabled'))
+            channels[channel.id] = channels.get(channel.id, frozenset()) - {name}
+            if not channels[channel.id]:
+                del channels[channel.id]
+            settings.set_value(ctx.guild.id, 'channel_disabled', channels)
+        command_masks.compile_guild(self.bot, ctx.guild.id)
+        await ctx.send(f'{name} has been enabled{f" in {channel.mention}" if channel else ""}.')
+
+    @guild_only()
+    @has_permissions(manage_guild=True)
+    @command(name='restrict')
+    async def restrict_command(self, ctx, name: str, *channels: TextChannel):
+        """Allow a command only in the given channels, or everywhere again if no channels are given.
+        For example: ;restrict spell #lookups"""
+        name = command_masks.maskable(self.bot, name)
+        if name is None:
+            return await ctx.send('That command doesn\'t exist or can\'t be restricted.')
+        command_channels = dict(settings.get(ctx.guild.id, 'command_channels'))
+        if channels:
+            command_channels[name] = frozenset(channel.id for channel in channels)
+        else:
+            command_channels.pop(name, None)
+        settings.set_value(ctx.guild.id, 'command_channels', command_channels)
+        command_masks.compile_guild(self.bot, ctx.guild.id)
+        if not channels:
+            return await ctx.send(f'{name} can be used in every channel again.')
+        await ctx.send(f'{name} can now only be used in {" ".join(channel.mention for channel in channels)}.')
+
     @command(name='help')
     async def new_help(self, ctx, second_help: str = None):
         """
         Shows this message
         """
-        embed = Embed(
-            title=':regional_indicator_h: :regional_indicator_e: :regional_indicator_l: :regional_indicator_p: ',
-            colour=0x68c290
-        )
-        cmd_names = [cmd.name for cmd in self.bot.commands]
-        cogs = sorted([cog for cog in self.bot.cogs.keys() if cog not in ['Tavern', 'ErrorHandler']])
-        if not second_help:
-            for cog_name in cogs:
-                cog = self.bot.get_cog(cog_name)
-                commands = [cmd for cmd in cog.get_commands() if not cmd.hidden]
-                message = f'{cog.description}\nCommands under this category:\n'
-                for cmd in commands:
-                    message += f'**{self.config["prefix"]}{cmd.name}:  ** *{cmd.help[0:40]}...*\n'
-                embed.add_field(name=cog_name, value=message, inline=False)
-            embed.add_field(name='Support Server', value='https://discord.gg/UJPzg8x', inline=False)
-            embed.set_footer(text=f"Use {self.config['prefix']}help (category)/(command) for more information.")
-        else:
-            cogs_lowercase = [cog.lower() for cog in cogs]
-            if second_help in cogs_lowercase:
-                index = cogs_lowercase.index(second_help)
-                cog = self.bot.get_cog(cogs[index])
-                commands = [command for command in cog.get_commands() if command.hidden is not True]
-                message = f'{cog.description}\nCommands under this category:\n'
-                for cmd in commands:
-                    name = cmd.name
-                    message += f'**{self.config["prefix"]}{name} :** {cmd.help[0:40]}\n'
-                embed.add_field(name=cogs[index], value=message + '**', inline=False)
-            elif second_help.lower() in cmd_names:
-                cmd = self.bot.get_command(second_help)
-                embed.add_field(name=cmd.name, value=cmd.help, inline=False)
-                value = ''
-                if cmd.aliases:
-                    for alias in cmd.aliases:
-                        value += f'{str(alias)}, '
-                    value = value[0:-2]
-                    value = value + '.'
-                else:
-                    value = None
-                embed.add_field(name="Aliases", value=f'*{value}*', inline=False)
-                params_list = list(cmd.params.keys())
-                req_params = []
-                for value in params_list:
-                    req_params.append(value)
-                req_params.remove('self')
-                req_params.remove('ctx')
-                param_message = 'Required parameters are:\n**'
-                if req_params:
-                    for parm in req_params:
-                        param_message += parm + '\n'
-                    embed.add_field(name='Usage', value=param_message + '**', inline=False)
-                else:
-                    embed.add_field(name='Usage', value=param_message + 'None**', inline=False)
+        embed = help_index.lookup(self.bot, get_prefix(self.bot, ctx.message), second_help)
+        if embed is None:
+            return await ctx.send(f"{str(second_help)} command/category does not exist!")
+        await ctx.send(embed=embed)
 
-            else:
-                return await ctx.send(f"{str(second_help)} command/category does not exist!")
+    @is_admin()
+    @command(name='dispatch', hidden=True)
+    async def dispatch_stats(self, ctx):
+        """Show queue depths of the worker pools and the slowest measured functions."""
+        metrics = self.bot.dispatcher.metrics()
+        embed = Embed(title='Dispatcher', colour=0x68c290)
+        for where, stats in metrics['pools'].items():
+            embed.add_field(name=where, value='\n'.join(f'{name}: {value}' for name, value in stats.items()))
+        slowest = sorted(metrics['costs'].items(), key=lambda item: item[1], reverse=True)[:10]
+        embed.description = '\n'.join(f'`{name}`: {cost * 1000:.2f}ms' for name, cost in slowest)
+        await ctx.send(embed=embed)
+
+    @is_admin()
+    @command(name='dbstats', hidden=True)
+    async def database_stats(self, ctx, order: str = 'total'):
+        """Show the database statements that took the most time, or with ;dbstats max, the slowest."""
+        key = (lambda h: h.max) if order == 'max' else (lambda h: h.total)
+        embed = Embed(title='Database statements', colour=0x68c290)
+        lines = []
+        for statement, histogram in statement_times.top(10, key=key):
+            statement = ' '.join(statement.split())
+            lines.append(f'`{statement[:80]}`\n{histogram.count}x, total {histogram.total * 1000:.0f}ms, '
+                         f'mean {histogram.mean * 1000:.2f}ms, p95 {histogram.percentile(95) * 1000:.2f}ms, '
+                         f'max {histogram.max * 1000:.2f}ms')
+        embed.description = '\n'.join(lines) or 'No statements yet.'
+        await ctx.send(embed=embed)
+
+    @is_admin()
+    @command(name='perf', hidden=True)
+    async def performance_stats(self, ctx, command_name: str = None):
+        """Show latency of the busiest commands, or of one command, split into parse, compute and send."""
+        by_command = {}
+        for (name, phase), histogram in metrics.command_times.items():
+            by_command.setdefault(name, {})[phase] = histogram
+        if command_name is not None:
+            by_command = {name: phases for name, phases in by_command.items() if name == command_name}
+        busiest = sorted(by_command.items(), key=lambda item: item[1]['total'].count, reverse=True)[:10]
+        embed = Embed(title='Command latency', colour=0x68c290)
+        for name, phases in busiest:
+            total = phases['total']
+            lines = [f'{total.count}x, p50 {total.percentile(50) * 1000:.1f}ms, '
+                     f'p95 {total.percentile(95) * 1000:.1f}ms, p99 {total.percentile(99) * 1000:.1f}ms, '
+                     f'max {total.max * 1000:.1f}ms']
+            lines.append(', '.join(f'{phase} {phases[phase].mean * 1000:.1f}ms' for phase in metrics.PHASES[:3]))
+            embed.add_field(name=name, value='\n'.join(lines), inline=False)
+        if not busiest:
+            embed.description = 'No commands timed yet.'
         await ctx.send(embed=embed)
 
     @is_admin()
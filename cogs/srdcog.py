@@ -1,23 +1,49 @@
 import logging
-from time import perf_counter_ns
+from functools import lru_cache
+from typing import Tuple
 
 from discord import Colour, Embed
 from discord.ext.commands import Cog, command, cooldown
 from discord.ext.commands.cooldowns import BucketType
-from discord.ext import buttons
 
-from backends.srd_json import srd
-from utils import helpers
+from backends.srd_json import FeatureInfo, MonsterInfo, SpellInfo, srd
+from utils import layout
+from utils.dispatch import THREAD
+from utils.layout import Field
 
 log = logging.getLogger('bot.' + __name__)
 
 PHB_COLOUR = Colour(0xeeeea0)
+LAYOUT_CACHE = 256  # laid out records kept per kind
 
 
-class Paginator(buttons.Paginator):
+# The layouts are cached by record; the embeds must not be changed after they are returned.
+@lru_cache(maxsize=LAYOUT_CACHE)
+def spell_pages(spell: SpellInfo) -> Tuple[Embed, ...]:
+    description = f'*{spell.subhead}*\n{spell.description}'
+    if spell.higher_levels is not None:
+        description += f'\n\u2001**At Higher Levels. **' + spell.higher_levels
+    fields = [Field('Casting Time', spell.casting_time, True), Field('Range', spell.casting_range, True),
+              Field('Components', spell.components, True), Field('Duration', spell.duration, True)]
+    return tuple(layout.paginate(spell.name, description, fields, colour=PHB_COLOUR,
+                                 footer=f'Player\'s Handbook, page {spell.page}.'))
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+
+@lru_cache(maxsize=LAYOUT_CACHE)
+def feature_pages(feature: FeatureInfo) -> Tuple[Embed, ...]:
+    if feature.level is None:
+        content = f'*{feature.featureclass} feature* \n'
+    else:
+        content = f'*Level {feature.level} {feature.featureclass} feature* \n'
+    return tuple(layout.paginate(feature.name, content + feature.description, colour=PHB_COLOUR))
+
+
+@lru_cache(maxsize=LAYOUT_CACHE)
+def monster_pages(monster: MonsterInfo) -> Tuple[Embed, ...]:
+    fields = [Field('Attributes', monster.attributes), Field('Ability Scores', monster.abilityscores),
+              Field('Features', monster.features)]
+    stats = layout.paginate(monster.name, monster.subhead, fields, colour=PHB_COLOUR)
+    return tuple(stats + layout.paginate('Actions', monster.actions, colour=PHB_COLOUR))
 
 
 class SRDCog(Cog, name='SRD Information'):
@@ -25,17 +51,21 @@ class SRDCog(Cog, name='SRD Information'):
     def __init__(self, bot):
         self.bot = bot
 
+    async def send_pages(self, ctx, pages):
+        """Send one page as it is, and more than one with a paginator."""
+        if len(pages) == 1:
+            return await ctx.send(embed=pages[0])
+        await self.bot.paginators.start(ctx, pages)
+
     @command(name='spell')
     @cooldown(1, 2, BucketType.user)
     async def spell_command(self, ctx, *request):
         """Give information on a spell by name."""
-        extra_pages = []
-        start_time = perf_counter_ns()
         request = ' '.join(request)
-        log.debug(f'spell command called with request: {request}')
+        log.debug('spell command called with request: %s', request)
         if len(request) <= 2:
             return await ctx.send('Request too short.')
-        matches = srd.search_spell(request)
+        matches = await self.bot.dispatcher.run(srd.search_spell, request, cost=THREAD)
         if len(matches) == 0:
             return await ctx.send(f'Couldn\'t find any spells that match \'{request}\'.')
         spell_names = [match.name for match in matches]
@@ -48,53 +78,17 @@ class SRDCog(Cog, name='SRD Information'):
             spell = matches[0]
         else:
             spell = matches[spell_names_lower.index(request.lower())]
-        description = f'*{spell.subhead}*\n{spell.description}'
-        if spell.higher_levels is not None:
-            description += f'\n\u2001**At Higher Levels. **' + spell.higher_levels
-        # is this description too long for a single embed?
-        descriptions = helpers.split_text(description, 2000)
-        end_time = perf_counter_ns()
-        elapsed_ms = (end_time - start_time) / 1_000_000
-        log.debug(f'Finished spell search in {elapsed_ms}ms')
-        if len(descriptions) == 1:  # only one embed required
-            embed = Embed(title=spell.name,
-                          colour=PHB_COLOUR,
-                          description=description)
-            embed.add_field(name="Casting Time", value=spell.casting_time, inline=True)
-            embed.add_field(name="Range", value=spell.casting_range, inline=True)
-            embed.add_field(name="Components", value=spell.components, inline=True)
-            embed.add_field(name="Duration", value=spell.duration, inline=True)
-            embed.set_footer(text=f'Player\'s Handbook, page {spell.page}.')
-            return await ctx.send(embed=embed)
-        else:
-            for i, description in enumerate(descriptions):
-                if i == 0:  # first embed?
-                    title = spell.name
-                else:
-                    title = spell.name + ' *(continued)*'
-                embed = Embed(title=title,
-                              colour=PHB_COLOUR,
-                              description=description)
-                if i == len(descriptions) - 1:  # final embed?
-                    embed.add_field(name="Casting Time", value=spell.casting_time, inline=True)
-                    embed.add_field(name="Range", value=spell.casting_range, inline=True)
-                    embed.add_field(name="Components", value=spell.components, inline=True)
-                    embed.add_field(name="Duration", value=spell.duration, inline=True)
-                    embed.set_footer(text=f'Player\'s Handbook, page {spell.page}.')
-                extra_pages.append(embed)
-            embed = Paginator(embed=False, timeout=90, use_defaults=True,
-                              extra_pages=extra_pages, length=1)
-            await embed.start(ctx)
+        await self.send_pages(ctx, spell_pages(spell))
 
     @command(name='condition')
     @cooldown(1, 2, BucketType.user)
     async def condition_command(self, ctx, *request):
         """Give information on a condition by name."""
         request = ' '.join(request)
-        log.debug(f'spell command called with request: {request}')
+        log.debug('spell command called with request: %s', request)
         if len(request) <= 2:
             return await ctx.send('Request too short.')
-        matches = srd.search_condition(request)
+        matches = await self.bot.dispatcher.run(srd.search_condition, request, cost=THREAD)
         if len(matches) == 0:
             return await ctx.send(f'Couldn\'t find any conditions that match \'{request}\'.')
         condition_names = [match.name for match in matches]
@@ -114,10 +108,10 @@ class SRDCog(Cog, name='SRD Information'):
     async def feature_command(self, ctx, *request):
         """Give information on a feature by name."""
         request = ' '.join(request)
-        log.debug(f'feature command called with request: {request}')
+        log.debug('feature command called with request: %s', request)
         if len(request) <= 2:
             return await ctx.send('Request too short.')
-        matches = srd.search_feature(request)
+        matches = await self.bot.dispatcher.run(srd.search_feature, request, cost=THREAD)
         if len(matches) == 0:
             return await ctx.send(f'Couldn\'t find any features that match \'{request}\'.')
         feature_names = [match.name for match in matches]
@@ -128,30 +122,17 @@ class SRDCog(Cog, name='SRD Information'):
             feature = matches[0]
         else:
             feature = matches[feature_names_lower.index(request.lower())]
-        if feature.level is None:
-            content = f'*{feature.featureclass} feature* \n'
-        else:
-            content = f'*Level {feature.level} {feature.featureclass} feature* \n'
-        content += feature.description
-        if len(content) < 2048:
-            embed = Embed(title=feature.name, colour=PHB_COLOUR, description=content)
-            return await ctx.send(embed=embed)
-        else:
-            embed = Embed(title=feature.name, colour=PHB_COLOUR, description=content[:2048])
-            embedtwo = Embed(title=f"{feature.name} *continued*", colour=PHB_COLOUR, description=content[2048:])
-            paginator = Paginator(embed=False, timeout=90, use_defaults=True,
-                                  extra_pages=[embed, embedtwo], length=1)
-            await paginator.start(ctx)
+        await self.send_pages(ctx, feature_pages(feature))
 
     @command(name='language')
     @cooldown(1, 2, BucketType.user)
     async def language_command(self, ctx, *request):
         """Give information on a language by name."""
         request = ' '.join(request)
-        log.debug(f'language command called with request: {request}')
+        log.debug('language command called with request: %s', request)
         if len(request) <= 2:
             return await ctx.send('Request too short.')
-        matches = srd.search_language(request)
+        matches = await self.bot.dispatcher.run(srd.search_language, request, cost=THREAD)
         if len(matches) == 0:
             return await ctx.send(f'Couldn\'t find any languages that match \'{request}\'.')
         language_names = [match.name for match in matches]
@@ -172,10 +153,10 @@ class SRDCog(Cog, name='SRD Information'):
     async def school_command(self, ctx, *request):
         """Give information on a school by name."""
         request = ' '.join(request)
-        log.debug(f'school command called with request: {request}')
+        log.debug('school command called with request: %s', request)
         if len(request) <= 2:
             return await ctx.send('Request too short.')
-        matches = srd.search_school(request)
+        matches = await self.bot.dispatcher.run(srd.search_school, request, cost=THREAD)
         if len(matches) == 0:
             return await ctx.send(f'Couldn\'t find any schools that match \'{request}\'.')
         school_names = [match.name for match in matches]
@@ -195,10 +176,10 @@ class SRDCog(Cog, name='SRD Information'):
     async def damagetype_command(self, ctx, *request):
         """Give information on a damage-type by name."""
         request = ' '.join(request)
-        log.debug(f'damage command called with request: {request}')
+        log.debug('damage command called with request: %s', request)
         if len(request) <= 2:
             return await ctx.send('Request too short.')
-        matches = srd.search_damage(request)
+        matches = await self.bot.dispatcher.run(srd.search_damage, request, cost=THREAD)
         if len(matches) == 0:
             return await ctx.send(f'Couldn\'t find any damage types that match \'{request}\'.')
         damage_names = [match.name for match in matches]
@@ -219,10 +200,10 @@ class SRDCog(Cog, name='SRD Information'):
     async def trait_command(self, ctx, *request):
         """Give information on a trait by name."""
         request = ' '.join(request)
-        log.debug(f'trait command called with request: {request}')
+        log.debug('trait command called with request: %s', request)
         if len(request) <= 2:
             return await ctx.send('Request too short.')
-        matches = srd.search_trait(request)
+        matches = await self.bot.dispatcher.run(srd.search_trait, request, cost=THREAD)
         if len(matches) == 0:
             return await ctx.send(f'Couldn\'t find any traits that match \'{request}\'.')
         trait_names = [match.name for match in matches]
@@ -244,10 +225,10 @@ class SRDCog(Cog, name='SRD Information'):
     async def monster_command(self, ctx, *request):
         """Give information on a monster by name."""
         request = ' '.join(request)
-        log.debug(f'monster command called with request: {request}')
+        log.debug('monster command called with request: %s', request)
         if len(request) <= 2:
             return await ctx.send('Request too short.')
-        matches = srd.search_monster(request)
+        matches = await self.bot.dispatcher.run(srd.search_monster, request, cost=THREAD)
         if len(matches) == 0:
             return await ctx.send(f'Couldn\'t find any monsters that match \'{request}\'.')
         monster_names = [match.name for match in matches]
@@ -258,38 +239,23 @@ class SRDCog(Cog, name='SRD Information'):
             monster = matches[0]
         else:
             monster = matches[monster_names_lower.index(request.lower())]
-        length = len(monster.actions)
-        stats = Embed(title=monster.name, value=monster.subhead, colour=PHB_COLOUR)
-        stats.add_field(name='Attributes', value=monster.attributes, inline=False)
-        stats.add_field(name='Ability Scores', value=monster.abilityscores, inline=False)
-        stats.add_field(name='Features', value=monster.features, inline=False)
-        if length < 2048:
-            action = Embed(title='Actions', colour=PHB_COLOUR, description=monster.actions)
-            embed = Paginator(embed=False, timeout=90, use_defaults=True,
-                              extra_pages=[stats, action], length=1)
-            await embed.start(ctx)
-        else:
-            action = Embed(title='Actions', colour=PHB_COLOUR, description=monster.actions[:2048])
-            actiontwo = Embed(title=F"Actions *continued*", colour=PHB_COLOUR, description=monster.actions[2048:])
-            embed = Paginator(embed=False, timeout=90, use_defaults=True,
-                              extra_pages=[stats, action, actiontwo], length=1)
-            await embed.start(ctx)
+        await self.bot.paginators.start(ctx, monster_pages(monster))
 
     @command(name='equipment')
     @cooldown(1, 2, BucketType.user)
     async def equipment_command(self, ctx, *request):
         """Give information on a equipment piece by name."""
         request = ' '.join(request)
-        log.debug(f'equipment command called with request: {request}')
+        log.debug('equipment command called with request: %s', request)
         if len(request) <= 2:
             return await ctx.send('Request too short.')
-        matches = srd.search_equipment(request)
+        matches = await self.bot.dispatcher.run(srd.search_equipment, request, cost=THREAD)
         # If it found no matches
         if len(matches) == 0:
             # Re-join the request with commas
             request = ', '.join(request.split())
             # Re-search
-            matches = srd.search_equipment(request)
+            matches = await self.bot.dispatcher.run(srd.search_equipment, request, cost=THREAD)
         if len(matches) == 0:
             return await ctx.send(f'Couldn\'t find any equipment pieces that match \'{request}\'.')
         equipment_names = [match.name for match in matches]
@@ -310,10 +276,10 @@ class SRDCog(Cog, name='SRD Information'):
     async def class_command(self, ctx, *request):
         """Give information on a class by name."""
         request = ' '.join(request)
-        log.debug(f'class command called with request: {request}')
+        log.debug('class command called with request: %s', request)
         if len(request) <= 2:
             return await ctx.send('Request too short.')
-        matches = srd.search_class(request)
+        matches = await self.bot.dispatcher.run(srd.search_class, request, cost=THREAD)
         if len(matches) == 0:
             return await ctx.send(f'Couldn\'t find any classes that match \'{request}\'.')
         classinfo_names = [match.name for match in matches]
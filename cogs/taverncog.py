@@ -1,5 +1,4 @@
 import logging
-import random
 import yaml
 from pathlib import Path
 
@@ -7,6 +6,7 @@ from discord import Colour, Embed, Member
 from discord.ext.commands import Cog, command
 from discord.utils import get
 
+from backends import corpora
 from utils.checks import is_tavern
 
 GREET_FILE = Path('resources') / 'tavern' / 'greetings.txt'  # messages for new Tavern members
@@ -24,6 +24,7 @@ class TavernCog(Cog, name='Tavern'):
         self.all_faq = self.load_faq()
         self.rules = self.load_rules()
         self.rprules = self.load_rprules()
+        corpora.load(GREET_FILE)
 
     def load_faq(self):
         with open(FAQ_FILE, encoding='utf-8') as faq_file:
@@ -44,18 +45,16 @@ class TavernCog(Cog, name='Tavern'):
     async def on_member_join(self, member: Member):
         """Send a custom greeting to new members of The Tavern."""
         if member.guild.id in self.bot.config['tavern']['guilds']:
-            log.debug(f'Sending greeting to new Tavern member {member}')
-            with open(GREET_FILE, 'r', encoding='utf-8') as f:
-                strings = f.readlines()
-            greeting = random.choice(strings)
+            log.debug('Sending greeting to new Tavern member %s', member)
+            greeting = corpora.choice(GREET_FILE)
             message = 'Welcome to The Tavern, ' + member.mention + '. ' + greeting
             channel = get(member.guild.channels, name='general')
             if channel is not None:
                 await channel.send(message)
             else:
-                log.warning(f'Could not send greeting to {member} in guild {member.guild}: no #general')
+                log.warning('Could not send greeting to %s in guild %s: no #general', member, member.guild)
         else:
-            log.debug(f'Not sending greeting to new member {member} of {member.guild}')
+            log.debug('Not sending greeting to new member %s of %s', member, member.guild)
 
     @command(name='tavern_help', aliases=['thelp'])
     async def tavern_help(self, ctx, cmd: str = "None"):
@@ -155,7 +154,7 @@ class TavernCog(Cog, name='Tavern'):
     @command(name='format')
     async def format_command(self, ctx, formattype=None):
         """Command that contains the formatting for some of the channels such as party-up."""
-        log.debug(f'loading format for {formattype}')
+        log.debug('loading format for %s', formattype)
         format_embed = Embed(colour=Colour.blurple())
         formats = ['party-up', 'resources']
         desc = ''
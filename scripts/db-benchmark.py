@@ -0,0 +1,68 @@
+# Measure database queries per second: a new engine per query (the old db_functions) against the shared pool
+# This script may be called from the scripts directory or the root directory of the bot
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy_aio import ASYNCIO_STRATEGY
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import utils.database as tables  # noqa: E402
+from utils.database import db_functions  # noqa: E402
+
+QUERIES = 500
+CONCURRENCY = 10
+GUILDS = 50_000
+
+
+async def query_new_engine(url, query):
+    """How db_query used to work: an engine and a connection for every query."""
+    engine = create_engine(url, strategy=ASYNCIO_STRATEGY)
+    conn = await engine.connect()
+    result = await conn.execute(query)
+    rows = await result.fetchall()
+    await conn.close()
+    return rows
+
+
+async def run(name, func, *args):
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def one():
+        async with semaphore:
+            await func(*args)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(QUERIES)))
+    elapsed = time.perf_counter() - start
+    print(f'{name:<20} {QUERIES / elapsed:8.0f} queries/s')
+
+
+async def main():
+    directory = tempfile.mkdtemp()
+    url = f'sqlite:///{os.path.join(directory, "benchmark.db")}'
+    engine = db_functions.setup_engine(url)
+    tables.metadata.create_all(engine.sync_engine)
+    for guild_id in range(100):
+        await db_functions.db_edit(tables.guild_settings.insert(), {'guild_id': guild_id, 'prefix': ';'})
+    query = tables.guild_settings.select().where(tables.guild_settings.c.guild_id == 42)
+    print(f'{QUERIES} queries, {CONCURRENCY} at a time')
+    await run('engine per query', query_new_engine, url, query)
+    await run('shared engine', db_functions.db_query, query)
+
+    # half of the stored guilds have left, and as many new ones have joined
+    await db_functions.reconcile_guilds(range(GUILDS), ';')
+    start = time.perf_counter()
+    added, removed = await db_functions.reconcile_guilds(range(GUILDS // 2, GUILDS * 3 // 2), ';')
+    elapsed = time.perf_counter() - start
+    print(f'reconcile {GUILDS} guilds: {len(added)} added, {len(removed)} removed in {elapsed:.3f}s')
+    db_functions.dispose_engine()
+
+
+asyncio.get_event_loop().run_until_complete(main())
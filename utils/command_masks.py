@@ -0,0 +1,92 @@
+"""Per-guild and per-channel enabling of commands, checked with one bitwise AND per command.
+
+Every command that is disabled or restricted anywhere gets a bit. The settings of a guild are
+compiled into an integer with the bits of the commands that can't be used there, and channels with
+rules of their own get an integer of their own. Masks are recompiled whenever the settings of a
+guild change, so checking a command never looks at the settings themselves. Only commands the bot
+has get a bit, and commands in ALWAYS_ENABLED are never masked, whatever the settings say."""
+import logging
+from typing import Dict
+
+from utils.database import settings
+
+log = logging.getLogger('bot.' + __name__)
+
+ALWAYS_ENABLED = settings.ALWAYS_ENABLED
+
+bits: Dict[str, int] = {}  # command name -> its bit
+guild_masks: Dict[int, int] = {}  # guild id -> bits of the commands that can't be used in the guild
+channel_masks: Dict[int, int] = {}  # channel id -> bits of the commands that can't be used in the channel
+_guild_channels: Dict[int, set] = {}  # guild id -> channels with a mask, to drop them on recompiling
+
+
+def bit(name: str) -> int:
+    """Return the bit of a command, giving it the next free one if it has none yet."""
+    if name not in bits:
+        bits[name] = 1 << len(bits)
+    return bits[name]
+
+
+def maskable(bot, name: str):
+    """Return the full name of a command that can be masked, or None for unknown and always enabled ones."""
+    cmd = bot.get_command(name)
+    if cmd is None or cmd.qualified_name in ALWAYS_ENABLED:
+        return None
+    return cmd.qualified_name
+
+
+def _mask(bot, names) -> int:
+    mask = 0
+    for name in names:
+        name = maskable(bot, name)
+        if name is not None:
+            mask |= bit(name)
+    return mask
+
+
+def compile_guild(bot, guild_id: int):
+    """Rebuild the masks of a guild from its settings."""
+    for channel_id in _guild_channels.pop(guild_id, ()):
+        del channel_masks[channel_id]
+    disabled = _mask(bot, settings.get(guild_id, 'disabled_commands'))
+    command_channels = settings.get(guild_id, 'command_channels')
+    restricted = _mask(bot, command_channels)
+    # channels where some restricted commands are allowed
+    allowed = {}
+    for name, channel_ids in command_channels.items():
+        command_bit = _mask(bot, (name,))
+        for channel_id in channel_ids:
+            allowed[channel_id] = allowed.get(channel_id, 0) | command_bit
+    channel_disabled = {channel_id: _mask(bot, names)
+                        for channel_id, names in settings.get(guild_id, 'channel_disabled').items()}
+    if disabled or restricted:
+        guild_masks[guild_id] = disabled | restricted
+    else:
+        guild_masks.pop(guild_id, None)
+    channels = set(allowed) | set(channel_disabled)
+    for channel_id in channels:
+        channel_masks[channel_id] = (disabled | (restricted & ~allowed.get(channel_id, 0)) |
+                                     channel_disabled.get(channel_id, 0))
+    if channels:
+        _guild_channels[guild_id] = channels
+
+
+def compile_all(bot):
+    """Build the masks of every guild with stored settings. Called at startup, after loading settings."""
+    guild_masks.clear()
+    channel_masks.clear()
+    _guild_channels.clear()
+    for guild_id in settings.guilds():
+        compile_guild(bot, guild_id)
+    log.info('Compiled command masks for %d guilds and %d channels', len(guild_masks), len(channel_masks))
+
+
+def allowed(guild_id: int, channel_id: int, name: str) -> bool:
+    """Whether a command may be used in a channel. Commands in direct messages have no guild id."""
+    command_bit = bits.get(name)
+    if command_bit is None:  # never disabled or restricted anywhere
+        return True
+    mask = channel_masks.get(channel_id)
+    if mask is None:
+        mask = guild_masks.get(guild_id, 0)
+    return not mask & command_bit
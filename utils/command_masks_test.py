@@ -0,0 +1,42 @@
+"""Pytests for command_masks.py"""
+
+from types import SimpleNamespace
+
+import command_masks as m
+from utils.database import settings
+
+COMMANDS = ('reddit', 'spell', 'roll', 'odds', 'settings')
+bot = SimpleNamespace(get_command=lambda name: SimpleNamespace(qualified_name=name) if name in COMMANDS else None)
+
+
+def test_masks(monkeypatch):
+    guild_settings = {
+        'disabled_commands': frozenset({'reddit'}),
+        'command_channels': {'spell': frozenset({10})},
+        'channel_disabled': {11: frozenset({'roll'})},
+    }
+    monkeypatch.setattr(settings, 'get', lambda guild_id, key: guild_settings[key] if guild_id == 1 else {})
+    m.compile_guild(bot, 1)
+    assert not m.allowed(1, 12, 'reddit')
+    assert not m.allowed(1, 10, 'reddit')
+    assert m.allowed(1, 10, 'spell')
+    assert not m.allowed(1, 12, 'spell')
+    assert not m.allowed(1, 11, 'roll')
+    assert m.allowed(1, 12, 'roll')
+    assert m.allowed(1, 12, 'odds')
+    assert m.allowed(2, 20, 'reddit')
+    assert m.allowed(None, 30, 'reddit')  # direct messages
+    guild_settings.update(disabled_commands=frozenset(), command_channels={}, channel_disabled={})
+    m.compile_guild(bot, 1)
+    assert m.allowed(1, 11, 'roll') and m.allowed(1, 12, 'reddit')
+    assert 1 not in m.guild_masks and 11 not in m.channel_masks
+
+
+def test_unmaskable(monkeypatch):
+    guild_settings = {'disabled_commands': frozenset({'settings', 'nonsense'}), 'command_channels': {},
+                      'channel_disabled': {}}
+    monkeypatch.setattr(settings, 'get', lambda guild_id, key: guild_settings[key])
+    m.compile_guild(bot, 3)
+    assert m.allowed(3, 30, 'settings')  # always enabled, whatever is stored
+    assert 3 not in m.guild_masks
+    assert 'nonsense' not in m.bits
@@ -0,0 +1,38 @@
+"""Guild and member totals, kept up to date from gateway events so that reading them is O(1).
+
+Member counts come from guild.member_count, which Discord sends with every guild, so the totals
+don't need the member lists to be cached. Member join and leave events need the members intent, see
+members_intent in config.yaml.example; without it, counts are only updated when the bot reconnects."""
+
+
+class GuildCounters:
+    def __init__(self):
+        self.member_counts = {}  # guild id -> member count
+        self.members = 0
+
+    @property
+    def guilds(self) -> int:
+        return len(self.member_counts)
+
+    def reset(self, guilds):
+        """Count all guilds from scratch, e.g. when the bot is ready."""
+        self.member_counts = {guild.id: guild.member_count or 0 for guild in guilds}
+        self.members = sum(self.member_counts.values())
+
+    def add_guild(self, guild):
+        self.remove_guild(guild)
+        self.member_counts[guild.id] = guild.member_count or 0
+        self.members += self.member_counts[guild.id]
+
+    def remove_guild(self, guild):
+        self.members -= self.member_counts.pop(guild.id, 0)
+
+    def member_joined(self, guild):
+        if guild.id in self.member_counts:
+            self.member_counts[guild.id] += 1
+            self.members += 1
+
+    def member_left(self, guild):
+        if self.member_counts.get(guild.id):
+            self.member_counts[guild.id] -= 1
+            self.members -= 1
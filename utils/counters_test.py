@@ -0,0 +1,20 @@
+"""Pytests for counters.py"""
+
+from types import SimpleNamespace
+
+import counters as m
+
+
+def test_counters():
+    counters = m.GuildCounters()
+    first, second = SimpleNamespace(id=1, member_count=10), SimpleNamespace(id=2, member_count=5)
+    counters.reset([first, second])
+    assert (counters.guilds, counters.members) == (2, 15)
+    counters.member_joined(first)
+    counters.member_left(second)
+    assert counters.members == 15
+    counters.remove_guild(first)  # its count may be stale by now, the tracked count is removed
+    assert (counters.guilds, counters.members) == (1, 4)
+    counters.add_guild(SimpleNamespace(id=3, member_count=None))
+    counters.add_guild(second)
+    assert (counters.guilds, counters.members) == (2, 5)
@@ -1,5 +1,5 @@
 from sqlalchemy import (
-    Column, BigInteger, MetaData, Table, String)
+    Column, BigInteger, Integer, MetaData, Table, String, Text)
 
 # Store all tables here.
 
@@ -10,3 +10,16 @@ guild_settings = Table(
     Column('guild_id', BigInteger, primary_key=True),
     Column('prefix', String(10)),
 )
+
+# typed per-guild settings, see utils.database.settings
+guild_config = Table(
+    'guild_config', metadata,
+    Column('guild_id', BigInteger, primary_key=True),
+    Column('key', String(32), primary_key=True),
+    Column('value', Text),  # JSON
+)
+
+schema_version = Table(
+    'schema_version', metadata,
+    Column('version', Integer, primary_key=True),
+)
@@ -1,65 +1,169 @@
 import logging
+from collections import Counter
+from time import perf_counter
 
 from sqlalchemy_aio import ASYNCIO_STRATEGY
-from sqlalchemy import create_engine
+from sqlalchemy import bindparam, create_engine, event, select
+from sqlalchemy.pool import QueuePool
 
 import utils.database as tables
+from utils.metrics import Histograms, register
 
 
 logger = logging.getLogger('bot.'+__name__)
+slow_logger = logging.getLogger('bot.database.slow')  # written to its own file, see bot.py
 
+DATABASE_URL = 'sqlite:///tavern.db'
+POOL_SIZE = 5  # connections kept open
+POOL_OVERFLOW = 5  # extra connections opened under load, closed again when returned
+POOL_TIMEOUT = 10  # seconds to wait for a free connection
+PRAGMAS = (
+    'PRAGMA journal_mode=WAL',  # readers don't block the writer, and commits don't rewrite the database
+    'PRAGMA synchronous=NORMAL',  # safe with WAL; only fsync at checkpoints
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-8000',  # 8 MB page cache per connection
+    'PRAGMA busy_timeout=5000',  # wait for a lock instead of failing straight away
+)
+SLOW_QUERY_THRESHOLD = 0.1  # seconds a statement may take before it is written to the slow query log
 
-async def db_query(query):
+engine = None
+slow_query_threshold = SLOW_QUERY_THRESHOLD
+statement_times = Histograms()  # SQL text (with placeholders, not values) -> latency histogram
+register('tavern_db_statement_seconds', statement_times, ('statement',))
+
+
+def _set_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma in PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+
+# the start time is kept on the statement's execution context, which is dropped with it if it fails
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    context.query_start = perf_counter()
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = perf_counter() - context.query_start
+    statement_times.observe(statement, elapsed)
+    if elapsed >= slow_query_threshold:
+        slow_logger.warning('%.1fms (%d rows): %s', elapsed * 1000, len(parameters) if executemany else 1, statement)
+
+
+def setup_engine(url=DATABASE_URL, slow_query=SLOW_QUERY_THRESHOLD):
+    """Create the engine shared by all database functions. Called once, at startup.
+
+    Every statement is timed; statements taking at least 'slow_query' seconds are logged."""
+    global engine, slow_query_threshold
+    if engine is not None:
+        return engine
+    slow_query_threshold = slow_query
     engine = create_engine(
-        'sqlite:///tavern.db', strategy=ASYNCIO_STRATEGY
+        url, strategy=ASYNCIO_STRATEGY,
+        # sqlalchemy_aio runs every connection in its own worker thread, so the sqlite connections
+        # may be used from another thread than the one that opened them. In-memory sqlite databases
+        # can't be shared between connections; use a file.
+        connect_args={'check_same_thread': False},
+        poolclass=QueuePool, pool_size=POOL_SIZE, max_overflow=POOL_OVERFLOW, pool_timeout=POOL_TIMEOUT,
     )
+    event.listen(engine.sync_engine, 'connect', _set_pragmas)
+    event.listen(engine.sync_engine, 'before_cursor_execute', _before_execute)
+    event.listen(engine.sync_engine, 'after_cursor_execute', _after_execute)
+    logger.info('Database engine created for %s', url)
+    return engine
+
+
+def dispose_engine():
+    """Close all pooled connections. Called on shutdown."""
+    global engine
+    if engine is not None:
+        engine.sync_engine.dispose()
+        engine = None
 
-    conn = await engine.connect()
-    try:
-        database_query = await conn.execute(query)
-        results = await database_query.fetchall()
-    except Exception as e:
-        logger.error(f'{str(e)} FOR {query}')
-        return None
-    else:
-        await conn.close()
-        logger.info(f'Db Query: {query}')
-        return results
+
+async def db_query(query):
+    async with setup_engine().connect() as conn:
+        try:
+            database_query = await conn.execute(query)
+            results = await database_query.fetchall()
+        except Exception as e:
+            logger.error('%s FOR %s', e, query)
+            return None
+    return results
 
 
 async def db_edit(db_code, data=None):
-    engine = create_engine(
-        # In-memory sqlite database cannot be accessed from different
-        # threads, use file.
-        'sqlite:///tavern.db', strategy=ASYNCIO_STRATEGY
-    )
-    conn = await engine.connect()
-    try:
-        if data is not None:
-            await conn.execute(db_code, data)
-        else:
-            await conn.execute(db_code)
-    except Exception as e:
-        logger.error(f'{str(e)} CODE : {db_code} + {data}')
-        return False
-    else:
-        await conn.close()
-        logger.info(f'DbCode: {db_code} + {data}')
-        return True
+    async with setup_engine().connect() as conn:
+        try:
+            if data is not None:
+                await conn.execute(db_code, data)
+            else:
+                await conn.execute(db_code)
+        except Exception as e:
+            logger.error('%s CODE : %s + %s', e, db_code, data)
+            return False
+    return True
+
+
+guild_prefixes = {}  # guild id -> prefix, written through whenever guild_settings changes
+prefix_starts = Counter()  # first characters of the cached prefixes, for a quick check of every message
 
 
-guild_ids = []
-guild_prefixes = []
+def cache_prefix(guild_id, prefix):
+    """Store a guild's prefix in the cache, after it was written to the database."""
+    uncache_prefix(guild_id)
+    if prefix:
+        guild_prefixes[guild_id] = prefix
+        prefix_starts[prefix[0]] += 1
+
+
+def uncache_prefix(guild_id):
+    """Remove a guild's prefix from the cache, after it was deleted from the database."""
+    prefix = guild_prefixes.pop(guild_id, None)
+    if prefix is not None:
+        prefix_starts[prefix[0]] -= 1
+        if not prefix_starts[prefix[0]]:
+            del prefix_starts[prefix[0]]
 
 
 async def cache_prefixes():
     """Caches all the prefix of all guilds from the database"""
     logger.info("caching prefixes from database...")
-    guild_ids.clear()
     guild_prefixes.clear()
+    prefix_starts.clear()
     table = tables.guild_settings
     guilds = await db_query(table.select())
-    for guild in guilds:
-        guild_ids.append(guild[0])
-        guild_prefixes.append(guild[1])
+    for guild in guilds or ():
+        cache_prefix(guild[0], guild[1])
     logger.info("caching prefixes from database...DONE")
+
+
+async def reconcile_guilds(guild_ids, default_prefix):
+    """Bring guild_settings in line with the guilds the bot is in, e.g. after it was offline.
+
+    Adds settings with the default prefix for missing guilds and deletes those of departed guilds,
+    with one executemany each in a single transaction; the settings of departed guilds in guild_config
+    are deleted with them. Returns the sets of guild ids added and removed."""
+    table = tables.guild_settings
+    current = set(guild_ids)
+    async with setup_engine().connect() as conn:
+        result = await conn.execute(select([table.c.guild_id]))
+        stored = {row[0] for row in await result.fetchall()}
+        missing = current - stored
+        departed = stored - current
+        async with conn.begin():
+            if missing:
+                await conn.execute(table.insert(), [{'guild_id': guild_id, 'prefix': default_prefix}
+                                                    for guild_id in missing])
+            if departed:
+                departed_ids = [{'departed_id': guild_id} for guild_id in departed]
+                await conn.execute(table.delete().where(table.c.guild_id == bindparam('departed_id')), departed_ids)
+                config = tables.guild_config
+                await conn.execute(config.delete().where(config.c.guild_id == bindparam('departed_id')), departed_ids)
+    for guild_id in missing:
+        cache_prefix(guild_id, default_prefix)
+    for guild_id in departed:
+        uncache_prefix(guild_id)
+    logger.info('Reconciled guild settings: %d added, %d removed', len(missing), len(departed))
+    return missing, departed
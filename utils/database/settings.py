@@ -0,0 +1,179 @@
+"""Typed per-guild settings, stored as key/value rows in guild_config.
+
+Every setting is declared in SETTINGS with its type and default. All stored settings are loaded into
+memory at startup, so reading one is a dictionary lookup; changes update the cache straight away and
+are written behind by utils.database.writer. Guilds without a stored value get the default.
+
+The prefix lives in guild_settings, which the prefix cache and guild reconciliation already use;
+reading and writing it here goes through that cache.
+
+Usage:
+    if settings.get(ctx.guild.id, 'dm_results'): ...
+    settings.set_value(ctx.guild.id, 'disabled_commands', frozenset({'reddit'}))"""
+import json
+import logging
+import re
+from collections import namedtuple
+
+from sqlalchemy import and_, bindparam, select
+
+import utils.database as tables
+from utils.database.db_functions import guild_prefixes, setup_engine
+from utils.database.writer import queue_prefix, writer
+
+log = logging.getLogger('bot.' + __name__)
+
+SCHEMA_VERSION = 1
+
+Setting = namedtuple('Setting',
+                     'kind default description')
+
+SETTINGS = {
+    'prefix': Setting(str, None, 'Prefix for commands in this server.'),
+    'dm_results': Setting(bool, False, 'Send the results of generators by DM.'),
+    'disabled_commands': Setting(frozenset, frozenset(), 'Commands that can\'t be used in this server.'),
+    'subreddits': Setting(tuple, (), 'Subreddits for ;reddit, instead of the default list.'),
+    # mappings are replaced as a whole when they change, never modified in place
+    'channel_disabled': Setting(dict, {}, 'Commands that can\'t be used in some channels, see ;disable.'),
+    'command_channels': Setting(dict, {}, 'Commands that can only be used in some channels, see ;restrict.'),
+}
+ALWAYS_ENABLED = frozenset({'disable', 'enable', 'restrict', 'settings', 'help'})  # so no server can lock itself out
+TRUE_WORDS = ('yes', 'y', 'on', 'true', '1')
+FALSE_WORDS = ('no', 'n', 'off', 'false', '0')
+MAX_PREFIX_LENGTH = 10
+SUBREDDIT = re.compile(r'[a-z0-9_]{3,21}')  # names reddit allows, lowercased; they go into URLs
+
+SET_CONFIG = tables.guild_config.insert().prefix_with('OR REPLACE')
+DELETE_CONFIG = tables.guild_config.delete().where(and_(tables.guild_config.c.guild_id == bindparam('config_guild'),
+                                                        tables.guild_config.c.key == bindparam('config_key')))
+
+_cache = {}  # guild id -> {key: value}, for settings that have been stored
+
+
+class SettingError(ValueError):
+    """Raised for unknown settings and values of the wrong type."""
+
+
+def get(guild_id: int, key: str):
+    """Return a guild's setting, or its default. Never touches the database."""
+    if key == 'prefix':
+        return guild_prefixes.get(guild_id)
+    return _cache.get(guild_id, {}).get(key, SETTINGS[key].default)
+
+
+def _command_names(bot, words) -> frozenset:
+    names = []
+    for word in words:
+        cmd = bot.get_command(word)
+        if cmd is None:
+            raise SettingError(f'There is no command called {word}.')
+        if cmd.qualified_name in ALWAYS_ENABLED:
+            raise SettingError(f'{cmd.qualified_name} can\'t be disabled.')
+        names.append(cmd.qualified_name)
+    return frozenset(names)
+
+
+def _subreddits(names) -> tuple:
+    for name in names:
+        if not SUBREDDIT.fullmatch(name):
+            raise SettingError(f'{name} isn\'t a subreddit name: use 3 to 21 letters, digits or underscores.')
+    return tuple(names)
+
+
+def parse(key: str, text: str, bot):
+    """Convert user input to the type of a setting, e.g. parse('dm_results', 'on', bot) == True.
+
+    Command names are checked against the bot's commands, and aliases replaced by the full name."""
+    if key not in SETTINGS:
+        raise SettingError(f'There is no setting called {key}.')
+    kind = SETTINGS[key].kind
+    if kind is bool:
+        if text.lower() in TRUE_WORDS:
+            return True
+        if text.lower() in FALSE_WORDS:
+            return False
+        raise SettingError(f'{key} must be yes or no.')
+    if key == 'disabled_commands':
+        return _command_names(bot, text.replace(',', ' ').lower().split())
+    if key == 'subreddits':
+        return _subreddits(text.replace(',', ' ').lower().split())
+    if kind in (frozenset, tuple):
+        return kind(word.strip().lower() for word in text.replace(',', ' ').split())
+    if kind is dict:
+        raise SettingError(f'{key} is changed with its own commands.')
+    if key == 'prefix' and not 0 < len(text) <= MAX_PREFIX_LENGTH:
+        raise SettingError(f'The prefix must be 1 to {MAX_PREFIX_LENGTH} characters.')
+    return kind(text)
+
+
+def _encode(value) -> str:
+    if isinstance(value, dict):  # as pairs, since JSON object keys can only be strings
+        return json.dumps(sorted([key, sorted(values)] for key, values in value.items()))
+    return json.dumps(sorted(value) if isinstance(value, frozenset) else value)
+
+
+def _decode(key: str, text: str):
+    if SETTINGS[key].kind is dict:
+        return {key: frozenset(values) for key, values in json.loads(text)}
+    return SETTINGS[key].kind(json.loads(text))
+
+
+def guilds():
+    """Return the ids of all guilds with stored settings, apart from the prefix."""
+    return list(_cache)
+
+
+def set_value(guild_id: int, key: str, value):
+    """Change a guild's setting. Takes effect straight away; the database is written shortly after."""
+    if key not in SETTINGS:
+        raise SettingError(f'There is no setting called {key}.')
+    if not isinstance(value, SETTINGS[key].kind):
+        raise SettingError(f'{key} must be a {SETTINGS[key].kind.__name__}.')
+    if key == 'subreddits':
+        _subreddits(value)
+    if key == 'prefix':
+        return queue_prefix(guild_id, value)
+    _cache.setdefault(guild_id, {})[key] = value
+    writer.submit(('guild_config', guild_id, key), SET_CONFIG,
+                  {'guild_id': guild_id, 'key': key, 'value': _encode(value)})
+
+
+def reset(guild_id: int, key: str):
+    """Go back to the default value of a setting."""
+    if key not in SETTINGS or key == 'prefix':
+        raise SettingError(f'{key} can\'t be reset.')
+    _cache.get(guild_id, {}).pop(key, None)
+    writer.submit(('guild_config', guild_id, key), DELETE_CONFIG, {'config_guild': guild_id, 'config_key': key})
+
+
+def forget_guild(guild_id: int):
+    """Drop the cached settings of a guild the bot has left; its rows are deleted by reconcile_guilds."""
+    _cache.pop(guild_id, None)
+
+
+def _migrate(connection):
+    """Bring the database up to SCHEMA_VERSION. Runs in a worker thread with a synchronous connection."""
+    tables.metadata.create_all(connection)
+    version = connection.execute(select([tables.schema_version.c.version])).scalar() or 0
+    if version == SCHEMA_VERSION:
+        return
+    # version 1 adds guild_config and schema_version, which create_all has made
+    with connection.begin():
+        connection.execute(tables.schema_version.delete())
+        connection.execute(tables.schema_version.insert(), {'version': SCHEMA_VERSION})
+    log.info('Migrated database from schema version %s to %s', version, SCHEMA_VERSION)
+
+
+async def cache_settings():
+    """Migrate the database if needed and load all stored settings. Called at startup."""
+    async with setup_engine().connect() as conn:
+        await conn.run_in_thread(_migrate, conn.sync_connection)
+        result = await conn.execute(tables.guild_config.select())
+        rows = await result.fetchall()
+    _cache.clear()
+    for guild_id, key, value in rows:
+        if key in SETTINGS:
+            _cache.setdefault(guild_id, {})[key] = _decode(key, value)
+        else:
+            log.warning('Ignoring unknown setting %s of guild %s', key, guild_id)
+    log.info('Cached settings of %d guilds', len(_cache))
@@ -0,0 +1,38 @@
+"""Pytests for settings.py"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from utils.database import settings as m
+
+ALIASES = {'r': 'roll', 'roll': 'roll', 'odds': 'odds', 'npc': 'npc', 'settings': 'settings'}
+bot = SimpleNamespace(get_command=lambda name: SimpleNamespace(qualified_name=ALIASES[name]) if name in ALIASES
+                      else None)
+
+
+def test_parse():
+    assert m.parse('dm_results', 'On', bot) is True
+    assert m.parse('dm_results', 'no', bot) is False
+    assert m.parse('disabled_commands', 'r, Odds npc', bot) == frozenset({'roll', 'odds', 'npc'})
+    assert m.parse('subreddits', 'dnd dndmemes', bot) == ('dnd', 'dndmemes')
+    assert m.parse('prefix', '!', bot) == '!'
+    for key, text in (('dm_results', 'maybe'), ('prefix', 'x' * 11), ('unknown', 'x'),
+                      ('disabled_commands', 'roll nonsense'), ('disabled_commands', 'settings'),
+                      ('subreddits', 'dnd ../api'), ('subreddits', 'dnd?limit=100'), ('subreddits', 'ab')):
+        with pytest.raises(m.SettingError):
+            m.parse(key, text, bot)
+
+
+def test_defaults_and_encoding():
+    assert m.get(1, 'dm_results') is False
+    assert m.get(1, 'disabled_commands') == frozenset()
+    value = frozenset({'roll', 'odds'})
+    assert m._decode('disabled_commands', m._encode(value)) == value
+    assert m._decode('subreddits', m._encode(('dnd',))) == ('dnd',)
+    channels = {123: frozenset({'roll'}), 456: frozenset({'odds', 'npc'})}
+    assert m._decode('channel_disabled', m._encode(channels)) == channels
+    with pytest.raises(m.SettingError):
+        m.set_value(1, 'dm_results', 'yes')
+    with pytest.raises(m.SettingError):
+        m.set_value(1, 'subreddits', ('dnd/../../api',))
@@ -0,0 +1,136 @@
+"""Write-behind queue for database changes.
+
+Commands don't wait for the database: they update the in-memory cache and queue the change here.
+A single task writes queued changes in batches, one transaction per batch, when FLUSH_SIZE changes
+are waiting or FLUSH_INTERVAL seconds have passed. Changes are queued under a key, and a newer change
+with the same key replaces one that hasn't been written yet, so only the latest state is written.
+Changes are written in the order they were queued; a change that replaces another moves to the end.
+
+Usage:
+    writer.submit(('guild_settings', guild.id), SET_PREFIX, {'guild_id': guild.id, 'prefix': prefix})
+    await writer.close()  # on shutdown, writes whatever is still queued"""
+import asyncio
+import logging
+
+from sqlalchemy import bindparam
+
+import utils.database as tables
+from utils.database.db_functions import cache_prefix, setup_engine, uncache_prefix
+
+log = logging.getLogger('bot.' + __name__)
+
+FLUSH_SIZE = 100  # changes waiting before a batch is written straight away
+FLUSH_INTERVAL = 2  # seconds a change may wait to be written
+MAX_ATTEMPTS = 3  # a batch that keeps failing is dropped after this many tries
+
+# statements for the changes queued by the functions below
+SET_PREFIX = tables.guild_settings.insert().prefix_with('OR REPLACE')
+DELETE_GUILD = tables.guild_settings.delete().where(tables.guild_settings.c.guild_id == bindparam('departed_id'))
+DELETE_GUILD_CONFIG = tables.guild_config.delete().where(tables.guild_config.c.guild_id == bindparam('departed_id'))
+
+
+class DatabaseWriter:
+    """Owns the queue of database changes and the task that writes them."""
+
+    def __init__(self, flush_size: int = FLUSH_SIZE, flush_interval: float = FLUSH_INTERVAL):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.pending = {}  # key -> (statement, parameters, attempts), in the order they were last queued
+        self.task = None
+        self.wake = None
+        self.lock = None
+        self.stats = {'queued': 0, 'coalesced': 0, 'written': 0, 'batches': 0, 'failed': 0}
+
+    def submit(self, key, statement, parameters: dict):
+        """Queue a change. It replaces any change with the same key that hasn't been written yet."""
+        if key in self.pending:
+            self.stats['coalesced'] += 1
+            del self.pending[key]  # so it is written after the changes queued before it, e.g. a guild removal
+        self.pending[key] = (statement, parameters, 0)
+        self.stats['queued'] += 1
+        if self.task is None:
+            self.start()
+        if len(self.pending) >= self.flush_size:
+            self.wake.set()
+
+    def start(self):
+        self.wake = asyncio.Event()
+        self.lock = asyncio.Lock()
+        self.task = asyncio.get_event_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wake.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Write everything that is queued now, in one transaction.
+
+        Changes stay queued until the transaction is committed, so an interrupted write loses nothing."""
+        if not self.pending:
+            return
+        async with self.lock:
+            batch = dict(self.pending)
+            runs = []  # (statement, parameters) in queue order, so a run of the same statement is one executemany
+            for statement, parameters, _ in batch.values():
+                if runs and runs[-1][0] is statement:
+                    runs[-1][1].append(parameters)
+                else:
+                    runs.append((statement, [parameters]))
+            try:
+                async with setup_engine().connect() as conn:
+                    async with conn.begin():
+                        for statement, parameters in runs:
+                            await conn.execute(statement, parameters)
+            except Exception:
+                self.stats['failed'] += 1
+                log.exception('Failed to write %d database changes', len(batch))
+                for key, change in batch.items():
+                    if self.pending.get(key) is not change:  # replaced by a newer change meanwhile
+                        continue
+                    statement, parameters, attempts = change
+                    if attempts + 1 < MAX_ATTEMPTS:
+                        self.pending[key] = (statement, parameters, attempts + 1)
+                    else:
+                        del self.pending[key]
+                return
+            for key, change in batch.items():
+                if self.pending.get(key) is change:
+                    del self.pending[key]
+            self.stats['written'] += len(batch)
+            self.stats['batches'] += 1
+            log.debug('Wrote %d database changes', len(batch))
+
+    async def close(self):
+        """Stop the writer task, then write what is still queued.
+
+        On SIGINT or SIGTERM, discord.py cancels all tasks before the bot is closed, so the task may
+        already be cancelled, possibly in the middle of a write."""
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        await self.flush()
+
+
+writer = DatabaseWriter()  # for export: the bot's database writer
+
+
+def queue_prefix(guild_id: int, prefix: str):
+    """Set a guild's prefix, adding its settings if needed. Takes effect in the cache straight away."""
+    cache_prefix(guild_id, prefix)
+    writer.submit(('guild_settings', guild_id), SET_PREFIX, {'guild_id': guild_id, 'prefix': prefix})
+
+
+def queue_guild_removal(guild_id: int):
+    """Delete a guild's prefix and its rows in guild_config. Takes effect in the prefix cache straight away."""
+    uncache_prefix(guild_id)
+    writer.submit(('guild_settings', guild_id), DELETE_GUILD, {'departed_id': guild_id})
+    writer.submit(('guild_config', guild_id), DELETE_GUILD_CONFIG, {'departed_id': guild_id})
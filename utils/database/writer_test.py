@@ -0,0 +1,74 @@
+"""Pytests for writer.py"""
+
+import asyncio
+
+from utils.database import writer as m
+from utils.database.settings import SET_CONFIG
+
+
+class BlockingEngine:
+    """Stands in for the database engine; its writes wait until they are unblocked."""
+
+    def __init__(self):
+        self.started = asyncio.Event()
+        self.blocked = True
+        self.written = []
+        self.statements = []
+
+    def connect(self):
+        return self
+
+    def begin(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def execute(self, statement, parameters):
+        self.started.set()
+        while self.blocked:
+            await asyncio.sleep(0.01)
+        self.written.extend(parameters)
+        self.statements.append(statement)
+
+
+def test_cancelled_mid_flush(monkeypatch):
+    async def run():
+        engine = BlockingEngine()
+        monkeypatch.setattr(m, 'setup_engine', lambda: engine)
+        writer = m.DatabaseWriter(flush_size=1)
+        writer.submit(('guild_settings', 1), m.SET_PREFIX, {'guild_id': 1, 'prefix': '!'})
+        await engine.started.wait()
+        writer.task.cancel()  # as discord.py does on SIGINT, before the bot is closed
+        await asyncio.sleep(0)
+        assert writer.pending  # the interrupted batch is still queued
+        engine.blocked = False
+        await writer.close()
+        return writer, engine
+
+    writer, engine = asyncio.run(run())
+    assert engine.written == [{'guild_id': 1, 'prefix': '!'}]
+    assert not writer.pending
+
+
+def test_queue_order(monkeypatch):
+    async def run():
+        engine = BlockingEngine()
+        engine.blocked = False
+        monkeypatch.setattr(m, 'setup_engine', lambda: engine)
+        monkeypatch.setattr(m, 'uncache_prefix', lambda guild_id: None)
+        monkeypatch.setattr(m, 'writer', m.DatabaseWriter())
+        key = ('guild_config', 1, 'dm_results')
+        m.writer.submit(key, SET_CONFIG, {'guild_id': 1, 'key': 'dm_results', 'value': 'false'})
+        m.queue_guild_removal(1)
+        m.writer.submit(key, SET_CONFIG, {'guild_id': 1, 'key': 'dm_results', 'value': 'true'})  # after rejoining
+        await m.writer.close()
+        return engine
+
+    engine = asyncio.run(run())
+    # the new setting is written after the removal deleted the old ones
+    assert engine.statements == [m.DELETE_GUILD, m.DELETE_GUILD_CONFIG, SET_CONFIG]
+    assert engine.written[-1]['value'] == 'true'
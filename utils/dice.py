@@ -0,0 +1,392 @@
+"""Dice expression language.
+
+Expressions are parsed once into a small syntax tree which is cached by expression text,
+so rolling the same expression again only has to evaluate the tree.
+
+Supported notation, for example '4d6kh3', '2d20kl1 + 5 >= 15', '8d6! - 1d4' or '1d20 + 7 dc 15':
+    NdS             roll N dice with S sides (N defaults to 1, 'd%' is a d100)
+    kh/kl/dh/dl n   keep or drop the n highest or lowest dice ('k n' keeps the highest, 'd n' drops the lowest)
+    !               exploding dice: every roll of the maximum adds another die
+    r n, r<n, r>n   reroll dice showing n (or less than/greater than n) until they don't; 'ro' rerolls once
+    + - * / ( )     arithmetic between integers and dice, '/' rounds down
+    >= > <= < =     compare the total against a target, 'dc n' is the same as '>= n'
+Several expressions can be rolled at once by separating them with spaces or commas: '4d10, 3d6 + 7'."""
+import operator
+import re
+from collections import namedtuple
+from functools import lru_cache
+from random import choice, randint
+from typing import List
+
+import numpy as np
+
+MAX_DICE = 10_000  # dice per term, including dice added by explosions
+MAX_ROLLED = 10_000  # dice rolled die by die in one roll, across all of its terms
+MAX_SIDES = 1000
+MAX_NUMBER = 1_000_000  # largest number that can be written in an expression
+DETAIL_LIMIT = 100  # bigger pools are sampled as counts per face instead of die by die
+
+TOKEN = re.compile(r'\s*(?:(?P<dice>(?P<count>\d*)d(?P<sides>\d+|%)'
+                   r'(?P<mods>(?:k[hl]?\d*|d[hl]\d*|d\d+|!|ro?[<>]?\d+)*))'
+                   r'|(?P<number>\d+)|(?P<dc>dc)|(?P<symbol>>=|<=|[-+*/()<>=,]))', re.IGNORECASE)
+MODIFIER = re.compile(r'(?P<kd>[kd])(?P<hl>[hl]?)(?P<amount>\d*)|(?P<explode>!)'
+                      r'|r(?P<once>o?)(?P<op>[<>]?)(?P<face>\d+)', re.IGNORECASE)
+
+_rng = np.random.default_rng()
+
+ARITHMETIC = {'+': operator.add, '-': operator.sub, '*': operator.mul, '/': operator.floordiv}
+COMPARISONS = {'>=': operator.ge, '<=': operator.le, '>': operator.gt, '<': operator.lt, '=': operator.eq}
+
+# 'kept' and 'dropped' list every die for pools of up to DETAIL_LIMIT dice. Bigger pools leave them
+# empty and give 'face_counts' instead: a tuple with the number of kept dice showing each face.
+DiceRoll = namedtuple('DiceRoll',
+                      'notation kept dropped total face_counts')
+
+RollResult = namedtuple('RollResult',
+                        'expression total dice success')
+
+
+class DiceError(ValueError):
+    """Raised for dice expressions that can't be parsed or rolled."""
+
+
+class Number:
+    __slots__ = ('value',)
+
+    def __init__(self, value: int):
+        self.value = value
+
+    def __str__(self):
+        return str(self.value)
+
+    def evaluate(self, dice: list) -> int:
+        return self.value
+
+
+class Dice:
+    """NdS with its modifiers. 'keep' is None or a ('k'|'d', 'h'|'l', amount) tuple of the dice to keep
+    or drop, 'reroll' is None or a (comparison, face, once) tuple."""
+    __slots__ = ('count', 'sides', 'keep', 'explode', 'reroll')
+
+    def __init__(self, count: int, sides: int, keep=None, explode=False, reroll=None):
+        self.count = count
+        self.sides = sides
+        self.keep = keep
+        self.explode = explode
+        self.reroll = reroll
+
+    def __str__(self):
+        text = f'{self.count}d{self.sides}'
+        if self.reroll is not None:
+            op, face, once = self.reroll
+            text += f'r{"o" if once else ""}{"" if op == "=" else op}{face}'
+        if self.explode:
+            text += '!'
+        if self.keep is not None:
+            text += ''.join(str(part) for part in self.keep)
+        return text
+
+    def _roll_one(self, faces: list) -> int:
+        """Roll one die, rerolling it if it matches. 'faces' lists the faces that are never rerolled."""
+        face = randint(1, self.sides)
+        if self.reroll is not None:
+            op, target, once = self.reroll
+            if COMPARISONS[op](face, target):
+                # rerolling until a die doesn't match is the same as rolling one of the other faces
+                face = randint(1, self.sides) if once else choice(faces)
+        return face
+
+    def _sample_counts(self, amount: int) -> np.ndarray:
+        """Roll 'amount' dice, including rerolls, and return how many show each face."""
+        uniform = np.full(self.sides, 1 / self.sides)
+        counts = _rng.multinomial(amount, uniform)
+        if self.reroll is not None:
+            op, target, once = self.reroll
+            rerolled = COMPARISONS[op](np.arange(1, self.sides + 1), target)
+            redo = counts[rerolled].sum()
+            counts[rerolled] = 0
+            if once:
+                counts += _rng.multinomial(redo, uniform)
+            else:  # rerolling until a die doesn't match is the same as rolling one of the other faces
+                counts += _rng.multinomial(redo, np.where(rerolled, 0, 1 / (~rerolled).sum()))
+        return counts
+
+    def _evaluate_counts(self, dice: list) -> int:
+        """Roll a big pool as counts per face, so the cost depends on the number of faces, not dice."""
+        counts = self._sample_counts(self.count)
+        if self.explode:
+            rolled = self.count
+            pending = counts[-1]
+            while pending and rolled < MAX_DICE:
+                pending = min(pending, MAX_DICE - rolled)
+                extra = self._sample_counts(pending)
+                counts += extra
+                rolled += pending
+                pending = extra[-1]
+        if self.keep is None:
+            kept = counts
+        else:
+            keep_or_drop, highest, amount = self.keep
+            if keep_or_drop == 'd':
+                amount = counts.sum() - amount
+                highest = 'l' if highest == 'h' else 'h'
+            ordered = counts[::-1] if highest == 'h' else counts
+            before = np.cumsum(ordered) - ordered  # dice of better faces than this one
+            kept = np.minimum(ordered, np.maximum(amount - before, 0))
+            if highest == 'h':
+                kept = kept[::-1]
+        total = int((np.arange(1, self.sides + 1) * kept).sum())
+        dice.append(DiceRoll(str(self), [], [], total, tuple(int(count) for count in kept)))
+        return total
+
+    def evaluate(self, dice: list) -> int:
+        if self.count > DETAIL_LIMIT:
+            return self._evaluate_counts(dice)
+        faces = None
+        if self.reroll is not None:
+            op, target, _ = self.reroll
+            faces = [face for face in range(1, self.sides + 1) if not COMPARISONS[op](face, target)]
+        limit = min(MAX_DICE, MAX_ROLLED - sum(len(roll.kept) + len(roll.dropped) for roll in dice))
+        if self.count > limit:
+            raise DiceError(f'You can roll up to {MAX_ROLLED} dice at a time, counting pools of up to '
+                            f'{DETAIL_LIMIT} dice and their explosions.')
+        rolls = [self._roll_one(faces) for _ in range(self.count)]
+        if self.explode:
+            pending = rolls.count(self.sides)
+            while pending and len(rolls) < limit:
+                face = self._roll_one(faces)
+                rolls.append(face)
+                pending += (face == self.sides) - 1
+        if self.keep is None:
+            kept, dropped = rolls, []
+        else:
+            keep_or_drop, highest, amount = self.keep
+            order = sorted(range(len(rolls)), key=rolls.__getitem__, reverse=highest == 'h')
+            if keep_or_drop == 'd':
+                order = order[amount:]
+                amount = len(order)
+            keep = set(order[:amount])
+            kept = [face for i, face in enumerate(rolls) if i in keep]
+            dropped = [face for i, face in enumerate(rolls) if i not in keep]
+        total = sum(kept)
+        dice.append(DiceRoll(str(self), kept, dropped, total, None))
+        return total
+
+
+class Negative:
+    __slots__ = ('operand',)
+
+    def __init__(self, operand):
+        self.operand = operand
+
+    def __str__(self):
+        if isinstance(self.operand, BinaryOp):
+            return f'-({self.operand})'
+        return f'-{self.operand}'
+
+    def evaluate(self, dice: list) -> int:
+        return -self.operand.evaluate(dice)
+
+
+class BinaryOp:
+    __slots__ = ('op', 'left', 'right')
+
+    def __init__(self, op: str, left, right):
+        self.op = op
+        self.left = left
+        self.right = right
+
+    def __str__(self):
+        left, right = str(self.left), str(self.right)
+        if self.op in '*/':  # only additions and subtractions ever need brackets
+            if isinstance(self.left, BinaryOp) and self.left.op in '+-':
+                left = f'({left})'
+            if isinstance(self.right, BinaryOp):
+                right = f'({right})'
+        elif self.op == '-' and isinstance(self.right, BinaryOp) and self.right.op in '+-':
+            right = f'({right})'
+        return f'{left} {self.op} {right}'
+
+    def evaluate(self, dice: list) -> int:
+        left = self.left.evaluate(dice)
+        right = self.right.evaluate(dice)
+        if self.op == '/' and right == 0:
+            raise DiceError('Can\'t divide by zero.')
+        return ARITHMETIC[self.op](left, right)
+
+
+class Comparison:
+    __slots__ = ('op', 'left', 'right')
+
+    def __init__(self, op: str, left, right):
+        self.op = op
+        self.left = left
+        self.right = right
+
+    def __str__(self):
+        return f'{self.left} {self.op} {self.right}'
+
+
+class _Parser:
+    """Recursive descent parser over the tokens of one expression text."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = self._tokenize(text)
+        self.pos = 0
+
+    @staticmethod
+    def _tokenize(text: str) -> list:
+        tokens = []
+        pos = 0
+        text = text.rstrip()
+        while pos < len(text):
+            match = TOKEN.match(text, pos)
+            if match is None:
+                raise DiceError(f'Invalid dice expression near "{text[pos:pos + 10].strip()}".')
+            tokens.append(match)
+            pos = match.end()
+        return tokens
+
+    def _peek(self):
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos]
+        return None
+
+    def _symbol(self):
+        token = self._peek()
+        if token is None:
+            return None
+        if token.group('dc'):
+            return 'dc'
+        return token.group('symbol')
+
+    def parse(self) -> tuple:
+        if not self.tokens:
+            raise DiceError('No dice were passed.')
+        expressions = []
+        while self._peek() is not None:
+            expressions.append(self.comparison())
+            if self._symbol() == ',':
+                self.pos += 1
+        return tuple(expressions)
+
+    def comparison(self):
+        left = self.additive()
+        symbol = self._symbol()
+        if symbol == 'dc':
+            self.pos += 1
+            return Comparison('>=', left, self.additive())
+        if symbol in COMPARISONS:
+            self.pos += 1
+            return Comparison(symbol, left, self.additive())
+        return left
+
+    def additive(self):
+        node = self.multiplicative()
+        while self._symbol() in ('+', '-'):
+            op = self._symbol()
+            self.pos += 1
+            node = BinaryOp(op, node, self.multiplicative())
+        return node
+
+    def multiplicative(self):
+        node = self.unary()
+        while self._symbol() in ('*', '/'):
+            op = self._symbol()
+            self.pos += 1
+            node = BinaryOp(op, node, self.unary())
+        return node
+
+    def unary(self):
+        if self._symbol() == '-':
+            self.pos += 1
+            return Negative(self.unary())
+        return self.atom()
+
+    def atom(self):
+        token = self._peek()
+        if token is None:
+            raise DiceError('Dice expression ended unexpectedly.')
+        self.pos += 1
+        if token.group('number'):
+            value = int(token.group('number'))
+            if value > MAX_NUMBER:
+                raise DiceError(f'Numbers in dice expressions can be at most {MAX_NUMBER}.')
+            return Number(value)
+        if token.group('dice'):
+            return self._dice(token)
+        if token.group('symbol') == '(':
+            node = self.additive()
+            if self._symbol() != ')':
+                raise DiceError('Missing closing bracket.')
+            self.pos += 1
+            return node
+        raise DiceError(f'Unexpected "{token.group().strip()}" in dice expression.')
+
+    @staticmethod
+    def _dice(token) -> Dice:
+        count = int(token.group('count') or 1)
+        sides = 100 if token.group('sides') == '%' else int(token.group('sides'))
+        if not 1 <= sides <= MAX_SIDES:
+            raise DiceError(f'Dice must have between 1 and {MAX_SIDES} sides.')
+        if not 1 <= count <= MAX_DICE:
+            raise DiceError(f'You can roll between 1 and {MAX_DICE} dice at a time.')
+        dice = Dice(count, sides)
+        for mod in MODIFIER.finditer(token.group('mods')):
+            if mod.group('explode'):
+                if sides == 1:
+                    raise DiceError('A d1 can\'t explode.')
+                dice.explode = True
+            elif mod.group('kd'):
+                keep_or_drop = mod.group('kd').lower()
+                highest = mod.group('hl').lower() or ('h' if keep_or_drop == 'k' else 'l')
+                dice.keep = (keep_or_drop, highest, int(mod.group('amount') or 1))
+            else:
+                if dice.reroll is not None:
+                    raise DiceError('Dice can only have one reroll modifier.')
+                op = mod.group('op') or '='
+                face = int(mod.group('face'))
+                if all(COMPARISONS[op](value, face) for value in range(1, sides + 1)):
+                    raise DiceError(f'Rerolling {mod.group().lower()} would reroll every face of a d{sides}.')
+                dice.reroll = (op, face, bool(mod.group('once')))
+        if dice.explode and dice.reroll is not None:
+            op, face, once = dice.reroll
+            if not once and all(COMPARISONS[op](value, face) for value in range(1, sides)):
+                raise DiceError('This die always explodes: every face but the highest is rerolled.')
+        return dice
+
+
+@lru_cache(maxsize=1024)
+def parse(expression: str) -> tuple:
+    """Parse a dice expression into a tuple of syntax trees, one per expression given.
+
+    Repeated identical expressions will be cached by decorator."""
+    return _Parser(expression.lower()).parse()
+
+
+def evaluate(node, dice: list = None) -> RollResult:
+    """Roll the dice of one parsed expression.
+
+    'dice' are the dice rolled so far by other expressions of the same roll, which count towards MAX_ROLLED.
+    The dice of this expression are added to it."""
+    if dice is None:
+        dice = []
+    start = len(dice)
+    if isinstance(node, Comparison):
+        total = node.left.evaluate(dice)
+        success = COMPARISONS[node.op](total, node.right.evaluate(dice))
+    else:
+        total = node.evaluate(dice)
+        success = None
+    return RollResult(str(node), total, dice[start:], success)
+
+
+def roll(expression: str) -> List[RollResult]:
+    """Roll every expression in a dice expression text, e.g. '4d6kh3, 1d20 + 5 dc 15'.
+
+    Raises DiceError for invalid expressions."""
+    if not isinstance(expression, str):
+        raise TypeError(f'Parameter `expression` must be of class `str`, not of {type(expression)}.')
+    dice = []
+    return [evaluate(node, dice) for node in parse(expression)]
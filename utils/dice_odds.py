@@ -0,0 +1,232 @@
+"""Exact outcome distributions for dice expressions.
+
+Walks the syntax trees made by utils.dice and computes the probability of every possible total:
+sums of dice by convolution (with an FFT for large pools), keep highest/lowest by order statistics,
+and arithmetic by combining independent distributions. Results are cached per normalised expression."""
+from collections import namedtuple
+from functools import lru_cache
+from math import factorial
+from typing import List
+
+import numpy as np
+
+from utils.dice import BinaryOp, COMPARISONS, Comparison, Dice, DiceError, Negative, Number, parse
+
+FFT_THRESHOLD = 4096  # use an FFT instead of repeated convolution above this many output values
+MAX_KEEP_DICE = 50  # keep/drop needs an order statistics pass per face, so pools are limited
+MAX_KEEP_WORK = 300_000_000  # estimated steps of the keep/drop pass, about half a second
+KEEP_STEP_OVERHEAD = 1000  # cost of one (face, dice assigned, dice showing) step besides its row
+MAX_OUTCOMES = 1_000_000
+MAX_TOTAL = 2 ** 62  # totals are counted in int64 arrays
+EXPLODE_TAIL = 1e-12  # explosions are followed until their remaining probability is below this
+MAX_EXPLODE_DEPTH = 100  # explosions followed at most; a die that explodes half the time needs 40
+PERCENTILES = (5, 25, 50, 75, 95)
+
+Distribution = namedtuple('Distribution',
+                          'offset probs')
+
+Odds = namedtuple('Odds',
+                  'expression mean stdev minimum maximum percentiles chance')
+
+
+def _constant(value: int) -> Distribution:
+    return Distribution(value, np.ones(1))
+
+
+def _values(dist: Distribution) -> np.ndarray:
+    return np.arange(dist.offset, dist.offset + len(dist.probs))
+
+
+def _single_die(dice: Dice) -> Distribution:
+    """Distribution of one die of the pool, including its rerolls and explosions."""
+    faces = np.arange(1, dice.sides + 1)
+    probs = np.full(dice.sides, 1 / dice.sides)
+    if dice.reroll is not None:
+        op, target, once = dice.reroll
+        rerolled = COMPARISONS[op](faces, target)
+        if once:
+            probs = np.where(rerolled, 0, probs) + rerolled.sum() / dice.sides ** 2
+        else:
+            probs = np.where(rerolled, 0, 1 / (~rerolled).sum())
+    if dice.explode:
+        # a die showing its maximum is rolled again and added, so value = k * sides + last roll
+        top = probs[-1]
+        if top >= 1:  # e.g. 1d2!r1, which rerolls every face but the one that explodes
+            raise DiceError('This die always explodes.')
+        depth = 1
+        while top ** depth > EXPLODE_TAIL and depth < MAX_EXPLODE_DEPTH:
+            depth += 1
+        exploded = np.zeros(dice.sides * depth)
+        for k in range(depth):
+            exploded[k * dice.sides:(k + 1) * dice.sides - 1] = top ** k * probs[:-1]
+        probs = exploded
+    return Distribution(1, probs)
+
+
+def _convolve(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """Distribution of the sum of two independent distributions, with an FFT for large ones."""
+    size = len(left) + len(right) - 1
+    if size > MAX_OUTCOMES:
+        raise DiceError('This expression has too many possible outcomes.')
+    if len(left) + len(right) > FFT_THRESHOLD:
+        length = 1 << (size - 1).bit_length()
+        result = np.fft.irfft(np.fft.rfft(left, length) * np.fft.rfft(right, length), length)[:size]
+        return np.clip(result, 0, None)
+    return np.convolve(left, right)
+
+
+def _power(probs: np.ndarray, count: int) -> np.ndarray:
+    """Distribution of the sum of 'count' independent copies of 'probs'."""
+    size = (len(probs) - 1) * count + 1
+    if size > MAX_OUTCOMES:
+        raise DiceError('This expression has too many possible outcomes.')
+    if size > FFT_THRESHOLD:
+        length = 1 << (size - 1).bit_length()
+        result = np.fft.irfft(np.fft.rfft(probs, length) ** count, length)[:size]
+        result = np.clip(result, 0, None)
+        return result / result.sum()
+    result = np.ones(1)
+    while count:
+        if count & 1:
+            result = np.convolve(result, probs)
+        probs = np.convolve(probs, probs)
+        count >>= 1
+    return result
+
+
+def _binomial(n: int, k: int) -> int:
+    return factorial(n) // (factorial(k) * factorial(n - k))
+
+
+def _keep(die: Distribution, count: int, highest: bool, amount: int) -> Distribution:
+    """Distribution of the sum of the 'amount' highest (or lowest) of 'count' dice.
+
+    A single kept die is the largest (smallest) order statistic, P(max <= x) = F(x)^count.
+    Otherwise faces are visited from the best down: given that 'r' dice are still unassigned and
+    all of them are at most this face, the number showing exactly this face is binomial."""
+    probs = die.probs if highest else die.probs[::-1]
+    cdf = np.cumsum(probs)
+    if amount == 1:
+        kept = np.diff(np.concatenate(([0], np.clip(cdf, 0, 1) ** count)))
+        return Distribution(die.offset, kept if highest else kept[::-1])
+    faces = len(probs)
+    size = (faces - 1) * amount + 1
+    steps = faces * (count + 1) * (count + 2) // 2
+    if steps * (size + KEEP_STEP_OVERHEAD) > MAX_KEEP_WORK:
+        raise DiceError('Keeping or dropping from this many dice and faces is too much work to compute exactly.')
+    # states[j] is the distribution of the kept sum (in face indices) after assigning j dice
+    states = np.zeros((count + 1, size))
+    states[0, 0] = 1
+    for index in range(faces - 1, -1, -1):
+        if probs[index] == 0:
+            continue
+        q = min(probs[index] / cdf[index], 1)
+        new_states = np.zeros_like(states)
+        for assigned in range(count + 1):
+            if not states[assigned].any():
+                continue
+            remaining = count - assigned
+            for showing in range(remaining + 1):
+                chance = _binomial(remaining, showing) * q ** showing * (1 - q) ** (remaining - showing)
+                if chance == 0:
+                    continue
+                shift = index * max(0, min(showing, amount - assigned))
+                row = new_states[assigned + showing]
+                row[shift:] += chance * states[assigned][:len(row) - shift]
+        states = new_states
+    kept = states[count]
+    return Distribution(die.offset * amount, kept if highest else kept[::-1])
+
+
+def _dice(dice: Dice) -> Distribution:
+    die = _single_die(dice)
+    if dice.keep is None:
+        return Distribution(die.offset * dice.count, _power(die.probs, dice.count))
+    keep_or_drop, highest, amount = dice.keep
+    if dice.count > MAX_KEEP_DICE:
+        raise DiceError(f'Odds for keeping or dropping dice are limited to {MAX_KEEP_DICE} dice.')
+    if dice.explode:  # exploded dice join the pool as separate dice before keeping
+        raise DiceError('Odds for keeping or dropping exploding dice aren\'t supported.')
+    if keep_or_drop == 'd':
+        amount = dice.count - amount
+        highest = 'l' if highest == 'h' else 'h'
+    amount = max(0, min(amount, dice.count))
+    if amount == 0:
+        return _constant(0)
+    return _keep(die, dice.count, highest == 'h', amount)
+
+
+def _combine(op: str, left: Distribution, right: Distribution) -> Distribution:
+    """Distribution of 'left op right' for independent distributions."""
+    if op == '+':
+        return Distribution(left.offset + right.offset, _convolve(left.probs, right.probs))
+    if op == '-':
+        return _combine('+', left, Distribution(-(right.offset + len(right.probs) - 1), right.probs[::-1]))
+    if len(left.probs) * len(right.probs) > MAX_OUTCOMES:
+        raise DiceError('This expression has too many possible outcomes.')
+    lvalues, rvalues = _values(left), _values(right)
+    if op == '/' and right.probs[rvalues == 0].sum() > 0:
+        raise DiceError('Can\'t divide by zero.')
+    if op == '*':
+        # the products of the extreme values bound every product, so check them before building the arrays
+        corners = [a * b for a in (left.offset, left.offset + len(left.probs) - 1)
+                   for b in (right.offset, right.offset + len(right.probs) - 1)]
+        if max(abs(corner) for corner in corners) > MAX_TOTAL:
+            raise DiceError('The totals of this expression are too large.')
+        if max(corners) - min(corners) >= MAX_OUTCOMES:
+            raise DiceError('This expression has too many possible outcomes.')
+        values = np.multiply.outer(lvalues, rvalues)
+    else:
+        values = np.floor_divide.outer(lvalues, np.where(rvalues == 0, 1, rvalues))
+    weights = np.multiply.outer(left.probs, right.probs)
+    offset = int(values.min())
+    return Distribution(offset, np.bincount((values - offset).ravel(), weights=weights.ravel()))
+
+
+def distribution(node) -> Distribution:
+    """Compute the exact distribution of the total of a parsed (non-comparison) expression."""
+    if isinstance(node, Number):
+        return _constant(node.value)
+    if isinstance(node, Dice):
+        return _dice(node)
+    if isinstance(node, Negative):
+        dist = distribution(node.operand)
+        return Distribution(-(dist.offset + len(dist.probs) - 1), dist.probs[::-1])
+    if isinstance(node, BinaryOp):
+        return _combine(node.op, distribution(node.left), distribution(node.right))
+    raise DiceError(f'Can\'t compute odds for "{node}".')
+
+
+def percentile(dist: Distribution, percent: float) -> int:
+    """Smallest total with at least 'percent' % of outcomes at or below it."""
+    cdf = np.cumsum(dist.probs)
+    return dist.offset + int(np.searchsorted(cdf, percent / 100 - 1e-12))
+
+
+def chance(dist: Distribution, op: str, target: int) -> float:
+    """Probability that a total compares to 'target' as 'op', e.g. chance(dist, '>=', 15)."""
+    return float(dist.probs[COMPARISONS[op](_values(dist), target)].sum())
+
+
+@lru_cache(maxsize=512)
+def _odds(expression: str) -> Odds:
+    node = parse(expression)[0]
+    success = None
+    if isinstance(node, Comparison):
+        # compare the difference of both sides against zero, so the target may contain dice too
+        dist = distribution(node.left)
+        success = chance(_combine('-', dist, distribution(node.right)), node.op, 0)
+    else:
+        dist = distribution(node)
+    values = _values(dist)
+    mean = float((values * dist.probs).sum())
+    stdev = float(np.sqrt(((values - mean) ** 2 * dist.probs).sum()))
+    percentiles = {percent: percentile(dist, percent) for percent in PERCENTILES}
+    return Odds(expression, mean, stdev, dist.offset, dist.offset + len(dist.probs) - 1, percentiles, success)
+
+
+def odds(expression: str) -> List[Odds]:
+    """Compute the odds of every expression in a dice expression text, e.g. '8d6, 1d20 + 7 dc 15'.
+
+    Raises DiceError for invalid expressions, or expressions too large to compute exactly."""
+    return [_odds(str(node)) for node in parse(expression)]
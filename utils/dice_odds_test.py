@@ -0,0 +1,57 @@
+"""Pytest tests for dice_odds.py"""
+
+import pytest
+
+import dice_odds as m
+
+
+def test_odds():
+    odds = m.odds('1d20 + 7 dc 15')[0]
+    assert odds.chance == pytest.approx(0.65)
+    assert odds.mean == pytest.approx(17.5)
+    odds = m.odds('8d6')[0]
+    assert odds.mean == pytest.approx(28)
+    assert (odds.minimum, odds.maximum) == (8, 48)
+    assert odds.percentiles[50] == 28
+    assert m.odds('8d6')[0] is odds
+
+
+def test_keep():
+    assert m.odds('2d20kh1')[0].mean == pytest.approx(13.825)
+    assert m.odds('2d20kl1')[0].mean == pytest.approx(7.175)
+    assert m.odds('4d6kh3')[0].mean == pytest.approx(12.2446, abs=1e-4)
+    assert m.odds('4d6dl1')[0].mean == pytest.approx(m.odds('4d6kh3')[0].mean)
+    assert m.odds('4d6kl3')[0].mean == pytest.approx(8.7554, abs=1e-4)
+
+
+def test_rerolls_and_explosions():
+    assert m.odds('1d6r1')[0].mean == pytest.approx(4)
+    assert m.odds('1d6ro1')[0].mean == pytest.approx(3.5 + 2.5 / 6)
+    assert m.odds('1d6!')[0].mean == pytest.approx(4.2)
+
+
+def test_arithmetic():
+    assert m.odds('1d4 * 1d4')[0].mean == pytest.approx(6.25)
+    assert m.odds('-1d4 + 10')[0].mean == pytest.approx(7.5)
+    assert m.odds('3d6 >= 2d6')[0].chance == pytest.approx(0.847994, abs=1e-6)
+    # large pools go through the FFT
+    odds = m.odds('100d100')[0]
+    assert odds.mean == pytest.approx(5050)
+    assert odds.percentiles[50] == 5050
+    # so do large sums and comparisons of pools
+    odds = m.odds('200d1000 >= 200d1000')[0]
+    assert odds.mean == pytest.approx(100100)
+    assert odds.chance == pytest.approx(0.5, abs=0.01)
+
+
+def test_invalid_odds():
+    with pytest.raises(m.DiceError):
+        m.odds('1d6 / (1d2 - 1)')
+    with pytest.raises(m.DiceError):
+        m.odds('50d1000kh49')  # too much work for the keep/drop pass, rejected before starting it
+    for expression in ('1d2!r1', '1d6r<6!'):  # only the exploding face is left
+        with pytest.raises(m.DiceError):
+            m.odds(expression)
+    for expression in ('1d6 * 99999999999999999999', '1d6 * 999999 * 999999', '1000000 * 1000000 * 1000000 * 10'):
+        with pytest.raises(m.DiceError):
+            m.odds(expression)
@@ -0,0 +1,72 @@
+"""Pytest tests for dice.py"""
+
+import pytest
+
+import dice as m
+
+
+def test_dice_roller():
+    roll = m.roll('10d1')
+    assert roll[0].total == 10
+    roll = m.roll('50d2')
+    dice = roll[0].dice[0].kept
+    assert all(die in dice for die in (1, 2))
+
+
+def test_parse():
+    assert [str(node) for node in m.parse('4d10 3d6+7')] == ['4d10', '3d6 + 7']
+    assert str(m.parse('d%')[0]) == '1d100'
+    assert str(m.parse('4d6d1')[0]) == '4d6dl1'
+    assert str(m.parse('1d20+7 DC 15')[0]) == '1d20 + 7 >= 15'
+    assert str(m.parse('(1d4+2)*3')[0]) == '(1d4 + 2) * 3'
+    assert m.parse('2d20kh1') is m.parse('2d20kh1')
+
+
+def test_keep_and_drop():
+    for expression in ('4d6kh3', '4d6dl1'):
+        die = m.roll(expression)[0].dice[0]
+        assert len(die.kept) == 3
+        assert min(die.kept) >= die.dropped[0]
+    die = m.roll('4d6kl1')[0].dice[0]
+    assert die.kept[0] <= min(die.dropped)
+
+
+def test_explode_and_reroll():
+    die = m.roll('20d2!')[0].dice[0]
+    assert len(die.kept) == 20 + die.kept.count(2)
+    assert all(face >= 3 for face in m.roll('50d6r<3')[0].dice[0].kept)
+    # every die rerolls on its own, up to the biggest pool that is still rolled die by die
+    die = m.roll(f'{m.DETAIL_LIMIT}d6r<6')[0].dice[0]
+    assert die.kept == [6] * m.DETAIL_LIMIT
+    assert m.roll(f'{m.DETAIL_LIMIT + 1}d6r<6')[0].total == 6 * (m.DETAIL_LIMIT + 1)
+
+
+def test_large_pools():
+    die = m.roll('10000d6')[0].dice[0]
+    assert die.kept == []
+    assert sum(die.face_counts) == 10000
+    assert die.total == sum(face * count for face, count in enumerate(die.face_counts, start=1))
+    die = m.roll('1000d6kh10')[0].dice[0]
+    assert die.total == 60
+    assert die.face_counts == (0, 0, 0, 0, 0, 10)
+    assert m.roll('1000d6dl990')[0].total == 60
+    assert m.roll('1000d6r<6')[0].total == 6000
+    with pytest.raises(m.DiceError):
+        m.roll('10001d6')
+    # the dice rolled one by one are limited across the whole roll, not per term
+    assert len(m.roll(' '.join(['100d6'] * 100))) == 100
+    with pytest.raises(m.DiceError):
+        m.roll(' '.join(['100d6'] * 101))
+
+
+def test_arithmetic_and_comparison():
+    assert m.roll('2 * (3 + 4) - 10 / 3')[0].total == 11
+    assert m.roll('1d1 + 5 >= 6')[0].success is True
+    assert m.roll('1d1 dc 2')[0].success is False
+
+
+def test_invalid_dice():
+    for expression in ('', 'abc', '1d6 +', '1d0', '1d6r<7', '(1d6', '5 / 0', '2d20 adv', '4d6r1ro2',
+                       '1d2!r1', '1d6r<6!'):
+        with pytest.raises(m.DiceError):
+            m.roll(expression)
@@ -0,0 +1,136 @@
+"""Decide where blocking work runs: inline on the event loop, in a thread pool, or in a process pool.
+
+Cheap work runs inline, since handing it to a pool costs more than doing it. Heavy work goes to a
+bounded pool so it can't stall the bot. Callers declare the cost of their work, or leave it to be
+measured: work is timed on every call, and anything that has recently taken longer than
+INLINE_BUDGET is moved off the event loop. Costs are measured per function, not per input, so work
+whose cost depends on its input (searches, user-supplied dice expressions) should declare THREAD.
+
+Usage, from a cog:
+    results = await self.bot.dispatcher.run(srd.search_spell, request, cost=THREAD)
+    names = await self.bot.dispatcher.run(name_batch, race, gender, amount)
+    result = await self.bot.dispatcher.run(simulate, party, monsters, cost=PROCESS, timeout=10)"""
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from time import perf_counter
+
+log = logging.getLogger('bot.' + __name__)
+
+CHEAP = 'cheap'  # always run inline on the event loop
+THREAD = 'thread'  # blocking I/O, or work that is too slow to run inline
+PROCESS = 'process'  # CPU-bound work; the function and its arguments must be picklable
+MEASURED = None  # inline or thread, decided by how long the function has been taking
+
+INLINE_BUDGET = 0.002  # seconds a measured function may take to keep running inline
+COST_DECAY = 0.9  # how quickly a slow call is forgotten, per call
+DEFAULT_TIMEOUT = 30  # seconds a pooled task may take before the caller gives up on it
+
+
+def _timed_call(func, args, kwargs):
+    """Call func and return its result with the time it took. Runs inside the worker."""
+    start = perf_counter()
+    result = func(*args, **kwargs)
+    return result, perf_counter() - start
+
+
+def _cost_key(func) -> str:
+    while isinstance(func, partial):
+        func = func.func
+    return f'{getattr(func, "__module__", "")}.{getattr(func, "__qualname__", repr(func))}'
+
+
+class PoolStats:
+    """Counters for one way of running work.
+
+    'pending' is the work queued or running in the pool, including work whose caller timed out
+    but which is still occupying a worker."""
+    __slots__ = ('submitted', 'completed', 'failed', 'timeouts', 'pending', 'max_pending', 'busy_time')
+
+    def __init__(self):
+        self.submitted = self.completed = self.failed = self.timeouts = 0
+        self.pending = self.max_pending = 0
+        self.busy_time = 0.0
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def _release(stats: PoolStats):
+    stats.pending -= 1
+
+
+class Dispatcher:
+    """Runs blocking functions for the bot's cogs. Available to cogs as bot.dispatcher."""
+
+    def __init__(self, thread_workers: int = 4, process_workers: int = 2):
+        self.threads = ThreadPoolExecutor(max_workers=thread_workers, thread_name_prefix='dispatch')
+        self.processes = ProcessPoolExecutor(max_workers=process_workers)
+        self.costs = {}  # function name -> decayed peak of its recent run times, in seconds
+        self.stats = {CHEAP: PoolStats(), THREAD: PoolStats(), PROCESS: PoolStats()}
+
+    def _record(self, key: str, elapsed: float):
+        self.costs[key] = max(elapsed, self.costs.get(key, elapsed) * COST_DECAY)
+
+    def choose(self, func, cost=MEASURED) -> str:
+        """Return where a call of func with the given declared cost would run."""
+        if cost is not MEASURED:
+            return cost
+        measured = self.costs.get(_cost_key(func))
+        if measured is None or measured > INLINE_BUDGET:  # unknown functions are run safely the first time
+            return THREAD
+        return CHEAP
+
+    async def run(self, func, *args, cost=MEASURED, timeout=DEFAULT_TIMEOUT, **kwargs):
+        """Run func(*args, **kwargs) where its cost says it should run, and return its result.
+
+        Pooled work raises asyncio.TimeoutError if it hasn't finished within 'timeout' seconds;
+        inline work can't be interrupted and ignores the timeout."""
+        key = _cost_key(func)
+        where = self.choose(func, cost)
+        stats = self.stats[where]
+        stats.submitted += 1
+        if where == CHEAP:
+            try:
+                result, elapsed = _timed_call(func, args, kwargs)
+            except Exception:
+                stats.failed += 1
+                raise
+            self._record(key, elapsed)
+            stats.completed += 1
+            stats.busy_time += elapsed
+            return result
+        executor = self.threads if where == THREAD else self.processes
+        loop = asyncio.get_event_loop()
+        stats.pending += 1
+        stats.max_pending = max(stats.max_pending, stats.pending)
+        work = executor.submit(_timed_call, func, args, kwargs)
+        # the worker is only free again when the work is done, even if the caller stopped waiting for it
+        work.add_done_callback(lambda _: loop.is_closed() or loop.call_soon_threadsafe(_release, stats))
+        try:
+            result, elapsed = await asyncio.wait_for(asyncio.wrap_future(work), timeout=timeout)
+        except asyncio.TimeoutError:
+            stats.timeouts += 1
+            log.warning('%s did not finish within %ss in the %s pool', key, timeout, where)
+            raise
+        except Exception:
+            stats.failed += 1
+            raise
+        self._record(key, elapsed)
+        stats.completed += 1
+        stats.busy_time += elapsed
+        return result
+
+    def metrics(self) -> dict:
+        """Counters and queue depths per pool, and the measured cost of every function seen."""
+        return {
+            'pools': {where: stats.as_dict() for where, stats in self.stats.items()},
+            'costs': dict(self.costs),
+        }
+
+    def shutdown(self):
+        """Stop the pools. Work already running in a process is waited for: on Python 3.7, a process pool
+        shut down without waiting leaves its workers running, and the interpreter then never exits."""
+        self.threads.shutdown(wait=False)
+        self.processes.shutdown(wait=True)
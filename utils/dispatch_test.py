@@ -0,0 +1,53 @@
+"""Pytest tests for dispatch.py"""
+
+import asyncio
+import time
+
+import pytest
+
+import dispatch as m
+
+
+def cheap(x):
+    return x + 1
+
+
+def slow(x):
+    time.sleep(0.01)
+    return x * 2
+
+
+def test_measured_cost():
+    dispatcher = m.Dispatcher(thread_workers=1, process_workers=1)
+
+    async def run():
+        assert dispatcher.choose(cheap) == m.THREAD  # unknown functions don't run inline
+        assert await dispatcher.run(cheap, 1) == 2
+        assert dispatcher.choose(cheap) == m.CHEAP
+        assert await dispatcher.run(cheap, 2) == 3
+        assert await dispatcher.run(slow, 2) == 4
+        assert dispatcher.choose(slow) == m.THREAD
+        assert dispatcher.choose(slow, cost=m.CHEAP) == m.CHEAP
+
+    asyncio.run(run())
+    pools = dispatcher.metrics()['pools']
+    assert pools[m.CHEAP]['completed'] == 1
+    assert pools[m.THREAD]['completed'] == 2
+    assert pools[m.THREAD]['pending'] == 0
+    dispatcher.shutdown()
+
+
+def test_timeout():
+    dispatcher = m.Dispatcher(thread_workers=1, process_workers=1)
+
+    async def run():
+        with pytest.raises(asyncio.TimeoutError):
+            await dispatcher.run(slow, 1, cost=m.THREAD, timeout=0.001)
+        assert dispatcher.stats[m.THREAD].pending == 1  # still occupying the worker
+        await asyncio.sleep(0.05)
+        assert dispatcher.stats[m.THREAD].pending == 0
+        assert await dispatcher.run(cheap, 1, cost=m.PROCESS) == 2
+
+    asyncio.run(run())
+    assert dispatcher.metrics()['pools'][m.THREAD]['timeouts'] == 1
+    dispatcher.shutdown()
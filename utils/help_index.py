@@ -0,0 +1,80 @@
+"""Rendered ;help embeds, built once per prefix instead of on every ;help.
+
+The index of a prefix maps every help topic (an empty topic for the overview, lowercase cog names and
+command names) to its embed. Indexes are cached per prefix, so a guild that changes its prefix simply
+gets the index of the new prefix. The whole cache is dropped whenever a cog or command is added or
+removed, i.e. when extensions are loaded or unloaded (see TavernBot in bot.py).
+
+Usage:
+    embed = help_index.lookup(bot, prefix, topic)  # None for an unknown topic"""
+import logging
+from typing import Dict, Optional
+
+from discord import Embed
+
+log = logging.getLogger('bot.' + __name__)
+
+TITLE = ':regional_indicator_h: :regional_indicator_e: :regional_indicator_l: :regional_indicator_p: '
+COLOUR = 0x68c290
+HIDDEN_COGS = ('Tavern', 'ErrorHandler')
+MAX_PREFIXES = 64  # indexes kept; the least recently built is dropped first
+
+_indexes: Dict[str, Dict[str, Embed]] = {}  # prefix -> topic -> embed
+
+
+def invalidate():
+    """Forget all rendered help, e.g. after an extension was loaded or unloaded."""
+    _indexes.clear()
+
+
+def _overview(cogs, prefix: str) -> Embed:
+    embed = Embed(title=TITLE, colour=COLOUR)
+    for cog_name, cog in cogs:
+        message = f'{cog.description}\nCommands under this category:\n'
+        for cmd in cog.get_commands():
+            if not cmd.hidden:
+                message += f'**{prefix}{cmd.name}:  ** *{(cmd.help or "")[0:40]}...*\n'
+        embed.add_field(name=cog_name, value=message, inline=False)
+    embed.add_field(name='Support Server', value='https://discord.gg/UJPzg8x', inline=False)
+    embed.set_footer(text=f'Use {prefix}help (category)/(command) for more information.')
+    return embed
+
+
+def _cog_help(cog_name: str, cog, prefix: str) -> Embed:
+    embed = Embed(title=TITLE, colour=COLOUR)
+    message = f'{cog.description}\nCommands under this category:\n'
+    for cmd in cog.get_commands():
+        if not cmd.hidden:
+            message += f'**{prefix}{cmd.name} :** {(cmd.help or "")[0:40]}\n'
+    embed.add_field(name=cog_name, value=message + '**', inline=False)
+    return embed
+
+
+def _command_help(cmd) -> Embed:
+    embed = Embed(title=TITLE, colour=COLOUR)
+    embed.add_field(name=cmd.name, value=cmd.help, inline=False)
+    aliases = ', '.join(cmd.aliases) + '.' if cmd.aliases else None
+    embed.add_field(name='Aliases', value=f'*{aliases}*', inline=False)
+    parameters = ''.join(parameter + '\n' for parameter in cmd.clean_params) or 'None'
+    embed.add_field(name='Usage', value=f'Required parameters are:\n**{parameters}**', inline=False)
+    return embed
+
+
+def build(bot, prefix: str) -> Dict[str, Embed]:
+    """Render the help of every topic for a prefix."""
+    cogs = [(name, bot.get_cog(name)) for name in sorted(bot.cogs) if name not in HIDDEN_COGS]
+    index = {cmd.name.lower(): _command_help(cmd) for cmd in bot.commands}
+    index.update((name.lower(), _cog_help(name, cog, prefix)) for name, cog in cogs)  # as before, cogs win
+    index[''] = _overview(cogs, prefix)
+    log.debug('Built the help index for prefix %r: %d topics', prefix, len(index))
+    return index
+
+
+def lookup(bot, prefix: str, topic: Optional[str] = None) -> Optional[Embed]:
+    """Return the help embed of a topic, or None if there is no such cog or command."""
+    index = _indexes.get(prefix)
+    if index is None:
+        if len(_indexes) >= MAX_PREFIXES:
+            del _indexes[next(iter(_indexes))]
+        index = _indexes[prefix] = build(bot, prefix)
+    return index.get((topic or '').lower())
@@ -0,0 +1,35 @@
+"""Pytests for help_index.py"""
+
+import asyncio
+
+from discord.ext.commands import Bot, Cog, command
+
+import help_index as m
+
+
+class Dice(Cog, name='Dice'):
+    """Rolling dice."""
+
+    @command(name='roll', aliases=['r'])
+    async def roll(self, ctx, dice: str, times: int = 1):
+        """Roll some dice."""
+
+
+def test_lookup():
+    async def run():
+        bot = Bot(command_prefix=';', help_command=None)
+        bot.add_cog(Dice())
+        return bot
+
+    bot = asyncio.run(run())
+    m.invalidate()
+    overview = m.lookup(bot, '!')
+    assert '**!roll:  **' in overview.fields[0].value
+    assert m.lookup(bot, '!', '') is overview  # rendered once per prefix
+    assert m.lookup(bot, '!', 'DICE').fields[0].name == 'Dice'
+    usage = m.lookup(bot, ';', 'roll').fields
+    assert usage[1].value == '*r.*'
+    assert usage[2].value == 'Required parameters are:\n**dice\ntimes\n**'
+    assert m.lookup(bot, ';', 'nothing') is None
+    m.invalidate()
+    assert m.lookup(bot, '!') is not overview
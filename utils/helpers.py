@@ -1,19 +1,16 @@
-import re
-from random import randint
-
-from utils.database.db_functions import guild_ids, guild_prefixes
+from utils.database.db_functions import guild_prefixes, prefix_starts
 
 
 def get_prefix(bot, message):
-    guild_id = message.guild.id
-    try:
-        index = guild_ids.index(guild_id)
-        prefix = guild_prefixes[index]
-    except ValueError:
-        prefix = bot.config['prefix']
-    if not message.guild:
-        return bot.command_prefix
-    return prefix
+    if message.guild is None:  # direct messages use the default prefix
+        return bot.config['prefix']
+    return guild_prefixes.get(message.guild.id, bot.config['prefix'])
+
+
+def may_be_command(bot, message) -> bool:
+    """Quick check whether a message starts like any known prefix, before looking up its guild's prefix."""
+    start = message.content[:1]
+    return bool(start) and (start in prefix_starts or start == bot.config['prefix'][:1])
 
 
 async def api_request(ctx, endpoint, value):
@@ -23,57 +20,8 @@ async def api_request(ctx, endpoint, value):
 
 def split_text(text: str, length: int) -> list:
     """Split text into strings of at most 'length' characters.
-    Returns a list of strings.
+    Returns a list of strings. See utils.layout.pack to split at line breaks and spaces instead.
     """
     if len(text) <= length:
         return [text]
-    splits = []
-    while len(text) > length:
-        splits.append(text[:length])
-        text = text[length:]
-    if len(text) > 0:
-        splits.append(text)
-    return splits
-
-
-def _normalize_dice(dice_list: list):
-    new_list = {}
-    for die in dice_list:
-        amount, die_type, *modifier = re.split(r'd|\s?[+-]', die)
-        die_type = int(die_type)
-        modifier = re.findall(r'[+-]\d+', die)
-        if die_type == 1:
-            continue
-        if die_type not in new_list:
-            new_list[die_type] = {'amount': int(amount)}
-            if modifier:
-                new_list[die_type]['modifiers'] = [int(modifier[0])]
-            else:
-                new_list[die_type]['modifiers'] = []
-            continue
-        new_list[die_type]['amount'] += int(amount)
-        if new_list[die_type]['amount'] > 20:
-            new_list[die_type]['amount'] = 20
-        if modifier:
-            new_list[die_type]['modifiers'].append(int(modifier[0]))
-    return new_list
-
-
-def roll_dice(dice: str):
-    if not isinstance(dice, str):
-        raise TypeError(f'Parameter `dice` must be of class `str`, not of {type(dice)}.')
-    dice.replace(',', '')
-    mdice = re.findall(r'\d+d\d+\s?[+-]\d+', dice)
-    for result in mdice:
-        dice = dice.replace(result, '')
-    nmdice = re.findall(r'\d+d\d+', dice)
-    dice = nmdice + mdice
-
-    if not dice:
-        raise TypeError('Either dice were not passed, or invalid dice were passed to the function.')
-    total_dice = _normalize_dice(dice)
-    for k, v in total_dice.items():
-        temp_list = [[randint(1, k) for _ in range(v['amount'])]]
-        temp_list.append(v['modifiers'])
-        total_dice[k] = temp_list
-    return total_dice
+    return [text[start:start + length] for start in range(0, len(text), length)]
@@ -1,6 +1,9 @@
 """Pytest tests for helpers.py"""
 
+from types import SimpleNamespace
+
 import helpers as m
+from utils.database import db_functions
 
 
 def test_split_text():
@@ -11,9 +14,15 @@ def test_split_text():
     assert split == ['testtes', 'ttest']
 
 
-def test_dice_roller():
-    roll = m.roll_dice('10d1')
-    assert roll == {}
-    roll = m.roll_dice('50d2')
-    dice = roll[2][0]
-    assert all(die in dice for die in (1, 2))
+def test_get_prefix():
+    bot = SimpleNamespace(config={'prefix': ';'})
+    db_functions.cache_prefix(1, '!!')
+    assert m.get_prefix(bot, SimpleNamespace(guild=SimpleNamespace(id=1))) == '!!'
+    assert m.get_prefix(bot, SimpleNamespace(guild=SimpleNamespace(id=2))) == ';'
+    assert m.get_prefix(bot, SimpleNamespace(guild=None)) == ';'
+    assert m.may_be_command(bot, SimpleNamespace(content='!!roll 1d20'))
+    assert m.may_be_command(bot, SimpleNamespace(content=';roll 1d20'))
+    assert not m.may_be_command(bot, SimpleNamespace(content='hello'))
+    assert not m.may_be_command(bot, SimpleNamespace(content=''))
+    db_functions.uncache_prefix(1)
+    assert not m.may_be_command(bot, SimpleNamespace(content='!!roll 1d20'))
@@ -0,0 +1,106 @@
+"""Laying out long text as embeds within Discord's limits.
+
+Text is packed into pages in one pass: every page is cut at the last paragraph break, line break or
+sentence end that fits and leaves the page at least half full, else at the last space, and only
+mid-word when there is none. Bold markup that is open at a cut is closed and opened again on the
+next page. Pages respect the limits on the description, field names and values, the number of fields
+and the total size of an embed.
+
+Usage:
+    pages = layout.paginate(spell.name, description, fields=[Field('Range', spell.casting_range, True)])"""
+from collections import namedtuple
+from typing import List, Optional, Sequence
+
+from discord import Embed
+
+TITLE_LIMIT = 256
+DESCRIPTION_LIMIT = 2048
+FIELD_NAME_LIMIT = 256
+FIELD_VALUE_LIMIT = 1024
+FIELD_LIMIT = 25  # fields per embed
+TOTAL_LIMIT = 6000  # characters in the title, description, field names and values and footer together
+BREAKS = ('\n\n', '\n', '. ', ' ')  # places to cut text, best first
+MIN_FILL = 0.5  # share of a chunk to fill before cutting anywhere but at a space
+BOLD = '**'
+EMPTY_FIELD = 'None'  # shown for an empty field value, which Discord rejects
+CONTINUED = ' *(continued)*'  # added to the title of every page after the first, and to continued fields
+
+Field = namedtuple('Field',
+                   'name value inline', defaults=(False,))
+
+
+def pack(text: str, limit: int) -> List[str]:
+    """Split text into chunks of at most 'limit' characters, at the best break that fits."""
+    if limit <= 2 * len(BOLD):
+        raise ValueError(f'Can\'t pack text into chunks of {limit} characters.')
+    chunks = []
+    start, end = len(text) - len(text.lstrip()), len(text)
+    reopen = ''  # bold markup to open again at the start of the next chunk
+    while start < end:
+        if reopen and text.startswith(BOLD, start):  # the bold text ended right at the cut, which closed it
+            start += len(BOLD)
+            reopen = ''
+            while start < end and text[start].isspace():
+                start += 1
+            continue
+        if end - start <= limit - len(reopen):
+            chunks.append(reopen + text[start:].rstrip())
+            break
+        stop = start + limit - len(reopen) - len(BOLD)  # leave room to close bold markup
+        cut = stop
+        fill = start + int((limit - len(reopen)) * MIN_FILL)
+        for separator in BREAKS:
+            index = text.rfind(separator, start if separator == ' ' else fill, stop)
+            if index > start:
+                cut = index + len(separator)
+                break
+        else:
+            if cut - 1 > start and text.startswith(BOLD, cut - 1):  # don't cut a bold marker in two
+                cut -= 1
+        chunk = reopen + text[start:cut].rstrip()
+        kept = len(chunk) - len(reopen) - len(BOLD)
+        if chunk.count(BOLD) % 2 and chunk.endswith(BOLD) and kept > 0:
+            # bold markup that would open at the very end of the chunk goes to the next one
+            cut = start + kept
+            chunk = reopen + text[start:cut].rstrip()
+        reopen = BOLD if chunk.count(BOLD) % 2 else ''
+        chunks.append(chunk + reopen)
+        start = cut
+        while start < end and text[start].isspace():
+            start += 1
+    return chunks
+
+
+def paginate(title: str, text: str = '', fields: Sequence[Field] = (), colour=Embed.Empty,
+             footer: Optional[str] = None) -> List[Embed]:
+    """Lay out a title, text and fields as embeds.
+
+    The text fills the descriptions, followed by the fields; a field value that is too long goes on
+    in the next field. The footer is shown on the last page."""
+    continued_title = (title + CONTINUED)[:TITLE_LIMIT]
+    budget = TOTAL_LIMIT - len(continued_title) - len(footer or '')
+    pages = []
+    size = 0  # of the fields on the last page so far
+
+    def new_page(description=Embed.Empty):
+        nonlocal size
+        pages.append(Embed(title=continued_title if pages else title[:TITLE_LIMIT],
+                           description=description, colour=colour))
+        size = len(description or '')
+
+    text = text.strip()
+    for description in pack(text, min(DESCRIPTION_LIMIT, budget)) if text else ():
+        new_page(description)
+    for field in fields:
+        value = str(field.value).strip() or EMPTY_FIELD
+        for part, chunk in enumerate(pack(value, FIELD_VALUE_LIMIT)):
+            name = (field.name + CONTINUED if part else field.name)[:FIELD_NAME_LIMIT]
+            if not pages or len(pages[-1].fields) >= FIELD_LIMIT or size + len(name) + len(chunk) > budget:
+                new_page()
+            pages[-1].add_field(name=name, value=chunk, inline=field.inline)
+            size += len(name) + len(chunk)
+    if not pages:
+        new_page()
+    if footer is not None:
+        pages[-1].set_footer(text=footer)
+    return pages
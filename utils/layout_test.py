@@ -0,0 +1,40 @@
+"""Pytests for layout.py"""
+
+import layout as m
+
+
+def test_pack():
+    assert m.pack('', 10) == []
+    assert m.pack('short', 10) == ['short']
+    assert m.pack('first paragraph\n\nsecond one', 20) == ['first paragraph', 'second one']
+    assert m.pack('one two three four', 12) == ['one two', 'three four']
+    assert m.pack('abcdefghijklmnop', 10) == ['abcdefgh', 'ijklmnop']  # no break: cut mid-word
+    assert m.pack('**bold words here** end', 16) == ['**bold words**', '**here** end']
+    assert m.pack('aaaaaaa**bold**', 11) == ['aaaaaaa', '**bold**']  # not 'aaaaaaa****'
+    assert m.pack('aaaaaaaa**bold**', 11) == ['aaaaaaaa', '**bold**']  # not between the asterisks
+    assert m.pack('**aaaaaaa**bbbbbbbbb', 11) == ['**aaaaaaa**', 'bbbbbbbbb']
+    assert m.pack('\n\n**bold** text', 10) == ['**bold**', 'text']  # no empty first chunk
+    # a paragraph break that would leave the page almost empty gives way to a later space
+    chunks = m.pack('Short\n\n' + 'word ' * 600, m.DESCRIPTION_LIMIT)
+    assert len(chunks) == 2
+    assert len(chunks[0]) > m.DESCRIPTION_LIMIT // 2
+    text = 'word ' * 10000
+    chunks = m.pack(text, 1024)
+    assert all(len(chunk) <= 1024 for chunk in chunks)
+    assert ' '.join(chunks) == text.strip()
+
+
+def test_paginate():
+    fields = [m.Field(f'Field {i}', 'x' * 1000) for i in range(10)] + [m.Field('Long', 'y ' * 1000, True)]
+    pages = m.paginate('Title', 'text ' * 1000, fields, footer='Footer')
+    assert [page.title for page in pages[:2]] == ['Title', 'Title' + m.CONTINUED]
+    for page in pages:
+        assert len(page) <= m.TOTAL_LIMIT
+        assert len(page.description or '') <= m.DESCRIPTION_LIMIT
+        assert len(page.fields) <= m.FIELD_LIMIT
+        assert all(len(field.value) <= m.FIELD_VALUE_LIMIT for field in page.fields)
+    assert [field.name for page in pages for field in page.fields][-2:] == ['Long', 'Long' + m.CONTINUED]
+    assert pages[-1].footer.text == 'Footer'
+    assert m.paginate('Empty')[0].title == 'Empty'
+    assert m.paginate('Spell', '\n\n**Range** 60 feet\n')[0].description == '**Range** 60 feet'
+    assert m.paginate('Monster', fields=[m.Field('Features', '')])[0].fields[0].value == m.EMPTY_FIELD
@@ -0,0 +1,141 @@
+"""Lazy extensions: cogs that are only imported when one of their commands is first used.
+
+At startup, the source of a lazy extension is parsed (not imported) to find its cogs and commands, and
+a stub command is registered for each, in a placeholder cog with the name and description of the real
+one, so ;help lists them as usual. The first time any of them is invoked, the extension is imported in
+a worker thread, so that its backend data loads without blocking other commands. The stubs are then
+replaced by the real cog, and the message is processed again to run the real command.
+
+Usage, from bot.py:
+    LazyExtension(bot, 'cogs.generatorcog').register()"""
+import ast
+import asyncio
+import importlib
+import importlib.util
+import logging
+import inspect
+from collections import OrderedDict, namedtuple
+from typing import List
+
+from discord.ext.commands import Cog, Command
+
+log = logging.getLogger('bot.' + __name__)
+
+StubInfo = namedtuple('StubInfo',
+                      'name aliases hidden help cog description parameters')
+
+
+def _keyword(call: ast.Call, name: str, default=None):
+    for keyword in call.keywords:
+        if keyword.arg == name:
+            return ast.literal_eval(keyword.value)
+    return default
+
+
+def _cog_name(node: ast.ClassDef) -> str:
+    for keyword in node.keywords:
+        if keyword.arg == 'name':
+            return ast.literal_eval(keyword.value)
+    return node.name
+
+
+def find_commands(extension: str) -> List[StubInfo]:
+    """Find the commands of an extension from its source, without importing it.
+
+    Looks for methods decorated with @command(...) or @commands.command(...), and gives the name and
+    description of the cog class they are in, and their parameters besides self and ctx."""
+    path = importlib.util.find_spec(extension).origin
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), path)
+    classes = [node for node in tree.body if isinstance(node, ast.ClassDef)]
+    stubs = []
+    for owner in classes or [tree]:
+        cog = _cog_name(owner) if owner is not tree else extension.rsplit('.', 1)[-1]
+        description = inspect.cleandoc(ast.get_docstring(owner) or '') if owner is not tree else ''
+        for node in ast.walk(owner):
+            if not isinstance(node, ast.AsyncFunctionDef):
+                continue
+            for decorator in node.decorator_list:
+                if not isinstance(decorator, ast.Call):
+                    continue
+                func = decorator.func
+                if (func.id if isinstance(func, ast.Name) else getattr(func, 'attr', None)) != 'command':
+                    continue
+                name = ast.literal_eval(decorator.args[0]) if decorator.args else _keyword(decorator, 'name', node.name)
+                arguments = node.args.posonlyargs + node.args.args + node.args.kwonlyargs
+                skipped = 2 if owner is not tree else 1  # self and ctx, or only ctx
+                stubs.append(StubInfo(name, tuple(_keyword(decorator, 'aliases', ())),
+                                      _keyword(decorator, 'hidden', False), ast.get_docstring(node) or '',
+                                      cog, description, tuple(argument.arg for argument in arguments[skipped:])))
+    return stubs
+
+
+class StubCommand(Command):
+    """A stub that takes any arguments, but shows the parameters of the real command in help."""
+
+    def __init__(self, func, **kwargs):
+        super().__init__(func, **kwargs)
+        self.parameters = kwargs.get('parameters', ())  # a keyword argument, so copies of the stub keep it
+
+    @property
+    def clean_params(self):
+        return OrderedDict((name, inspect.Parameter(name, inspect.Parameter.POSITIONAL_OR_KEYWORD))
+                           for name in self.parameters)
+
+
+async def _stub_callback(cog, ctx, *, arguments=None):
+    """Callback of every stub, run with its placeholder cog: load the extension and run the real command."""
+    await cog.lazy.load_and_invoke(ctx)
+
+
+class LazyExtension:
+    """Stub commands for an extension, which load the extension when one of them is used."""
+
+    def __init__(self, bot, extension: str):
+        self.bot = bot
+        self.extension = extension
+        self.cogs = {}  # cog name -> placeholder cog holding the stubs of its commands
+        for info in find_commands(extension):
+            cog = self.cogs.get(info.cog)
+            if cog is None:
+                cog = self.cogs[info.cog] = type(Cog)(info.cog, (Cog,), {'__doc__': info.description}, name=info.cog)()
+                cog.lazy = self
+                cog.__cog_commands__ = ()
+            stub = StubCommand(_stub_callback, name=info.name, aliases=list(info.aliases), hidden=info.hidden,
+                               help=info.help, parameters=info.parameters)
+            cog.__cog_commands__ += (stub,)
+        self.lock = asyncio.Lock()
+
+    @property
+    def stubs(self) -> List[Command]:
+        return [stub for cog in self.cogs.values() for stub in cog.get_commands()]
+
+    def register(self):
+        for cog in self.cogs.values():
+            self.bot.add_cog(cog)
+        log.debug('Registered %d stub commands for %s', len(self.stubs), self.extension)
+
+    def unregister(self):
+        for name in self.cogs:
+            self.bot.remove_cog(name)
+
+    async def load(self):
+        """Import the extension in a thread and swap the stubs for its real commands."""
+        async with self.lock:  # commands used while loading wait for the same import
+            if self.extension in self.bot.extensions:
+                return
+            log.info('Loading lazy extension %s', self.extension)
+            await asyncio.get_event_loop().run_in_executor(None, importlib.import_module, self.extension)
+            self.unregister()
+            try:
+                self.bot.load_extension(self.extension)  # the module is imported, so this only runs its setup
+            except Exception:
+                self.register()
+                raise
+
+    async def load_and_invoke(self, ctx):
+        """Load the extension, then process the message of a stub's context again."""
+        await self.load()
+        real_ctx = await self.bot.get_context(ctx.message, cls=type(ctx))
+        real_ctx.received = getattr(ctx, 'received', None)  # for the command timings in bot.py
+        await self.bot.invoke(real_ctx)
@@ -0,0 +1,41 @@
+"""Pytests for lazy.py"""
+
+import asyncio
+
+from discord.ext.commands import Bot
+
+import help_index
+import lazy as m
+
+
+def test_find_commands():
+    stubs = {stub.name: stub for stub in m.find_commands('cogs.specialcog')}
+    assert stubs['basic'].aliases == ('srd',)
+    assert stubs['dispatch'].hidden
+    assert stubs['invite'].help == 'Invite the bot to your discord server.'
+    stubs = {stub.name: stub for stub in m.find_commands('cogs.generatorcog')}
+    assert stubs['npc'].cog == 'Generator'
+    assert stubs['npc'].description.startswith('Information generators.')
+    assert stubs['npc'].parameters == ('amount', 'file_format')
+    assert {'npc', 'name', 'generate', 'invent'} <= set(stubs)
+
+
+def test_lazy_extension():
+    async def run():
+        bot = Bot(command_prefix=';', help_command=None)
+        lazy = m.LazyExtension(bot, 'cogs.generatorcog')
+        lazy.register()
+        assert bot.get_command('npc').cog is bot.get_cog('Generator')  # the placeholder, until loaded
+        help_index.invalidate()
+        assert 'Generator' in [field.name for field in help_index.lookup(bot, ';').fields]
+        assert help_index.lookup(bot, ';', 'generator') is not None
+        usage = help_index.lookup(bot, ';', 'npc').fields[2].value
+        assert usage == 'Required parameters are:\n**amount\nfile_format\n**'
+        placeholder = bot.get_cog('Generator')
+        await lazy.load()
+        assert bot.get_cog('Generator') is not placeholder
+        return bot
+
+    bot = asyncio.run(run())
+    assert 'cogs.generatorcog' in bot.extensions
+    assert bot.get_command('npc').cog is bot.get_cog('Generator')
@@ -0,0 +1,131 @@
+"""Latency histograms for the bot's own metrics, and a Prometheus endpoint to scrape them.
+
+A Histogram counts observations in fixed buckets from 0.1ms to about 100s: every doubling is split
+into SUB_BUCKETS buckets of equal width, so a percentile estimated from the bucket bounds is at most
+1 / SUB_BUCKETS too high. Recording is a bisect and an increment, and memory is bounded by the number
+of names, not the number of observations."""
+import logging
+from bisect import bisect_left
+from threading import Lock
+from typing import Dict, Hashable
+
+from aiohttp import web
+
+log = logging.getLogger('bot.' + __name__)
+
+SUB_BUCKETS = 8  # linear buckets per doubling
+# upper bounds in seconds: 0.1ms, then SUB_BUCKETS per doubling up to 105s
+BUCKETS = (0.0001,) + tuple(0.0001 * 2 ** i * (SUB_BUCKETS + j) / SUB_BUCKETS
+                            for i in range(20) for j in range(1, SUB_BUCKETS + 1))
+
+
+class Histogram:
+    """Counts, total, maximum and bucketed distribution of durations in seconds."""
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # the last bucket is for anything slower
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, percent: float) -> float:
+        """Upper bound of the bucket holding the given percentile, or the maximum if that's lower."""
+        if not self.count:
+            return 0.0
+        target = self.count * percent / 100
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                break
+        return min(BUCKETS[index] if index < len(BUCKETS) else self.max, self.max)
+
+
+class Histograms:
+    """Histograms by name, safe to record into from worker threads. Names may be tuples of labels."""
+
+    def __init__(self):
+        self.histograms: Dict[Hashable, Histogram] = {}
+        self.lock = Lock()
+
+    def observe(self, name: Hashable, seconds: float):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def top(self, amount: int = 10, key=lambda histogram: histogram.total):
+        """The 'amount' names with the highest key, by default the most total time spent."""
+        with self.lock:
+            items = list(self.histograms.items())
+        return sorted(items, key=lambda item: key(item[1]), reverse=True)[:amount]
+
+    def clear(self):
+        with self.lock:
+            self.histograms.clear()
+
+    def items(self):
+        with self.lock:
+            return list(self.histograms.items())
+
+
+command_times = Histograms()  # (command name, phase) -> latency, recorded by the invoke hooks in bot.py
+_registry = {}  # metric name -> (histograms, label names), for the Prometheus endpoint
+PHASES = ('parse', 'compute', 'send', 'total')
+
+
+def register(metric: str, histograms: Histograms, labels: tuple):
+    """Expose histograms as a Prometheus metric; their names are tuples of values for 'labels'."""
+    _registry[metric] = (histograms, labels)
+
+
+register('tavern_command_seconds', command_times, ('command', 'phase'))
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+def prometheus() -> str:
+    """All registered histograms in the Prometheus text exposition format."""
+    lines = []
+    for metric, (histograms, labels) in sorted(_registry.items()):
+        lines.append(f'# TYPE {metric} histogram')
+        for name, histogram in histograms.items():
+            values = name if isinstance(name, tuple) else (name,)
+            label_text = ','.join(f'{label}="{_escape(value)}"' for label, value in zip(labels, values))
+            cumulative = 0
+            for bound, count in zip(BUCKETS, histogram.counts):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{{label_text},le="{bound:g}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{{label_text},le="+Inf"}} {histogram.count}')
+            lines.append(f'{metric}_sum{{{label_text}}} {histogram.total}')
+            lines.append(f'{metric}_count{{{label_text}}} {histogram.count}')
+    return '\n'.join(lines) + '\n'
+
+
+async def start_server(host: str = '127.0.0.1', port: int = 9100) -> web.AppRunner:
+    """Serve the registered metrics at http://host:port/metrics. Returns the runner, to clean up with."""
+    async def metrics_handler(request):
+        return web.Response(text=prometheus(), content_type='text/plain', charset='utf-8')
+
+    app = web.Application()
+    app.router.add_get('/metrics', metrics_handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    log.info('Serving metrics on http://%s:%s/metrics', host, port)
+    return runner
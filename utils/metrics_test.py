@@ -0,0 +1,49 @@
+"""Pytests for metrics.py"""
+
+import metrics as m
+
+
+def test_histogram():
+    histogram = m.Histogram()
+    assert histogram.percentile(50) == 0.0
+    for ms in range(1, 101):
+        histogram.observe(ms / 1000)
+    assert histogram.count == 100
+    assert abs(histogram.mean - 0.0505) < 1e-9
+    assert histogram.max == 0.1
+    assert 0.05 <= histogram.percentile(50) <= 0.1
+    assert histogram.percentile(100) == 0.1
+    histogram.observe(1000)
+    assert histogram.counts[-1] == 1
+    assert histogram.percentile(100) == 1000
+
+
+def test_percentile_error():
+    for seconds in (0.00015, 0.0101, 0.33, 7.5):
+        histogram = m.Histogram()
+        for _ in range(99):
+            histogram.observe(seconds)
+        histogram.observe(100)
+        assert seconds <= histogram.percentile(50) <= seconds * (1 + 1 / m.SUB_BUCKETS)
+
+
+def test_histograms():
+    histograms = m.Histograms()
+    histograms.observe('fast', 0.001)
+    histograms.observe('slow', 0.5)
+    histograms.observe('fast', 0.001)
+    assert [name for name, _ in histograms.top()] == ['slow', 'fast']
+    assert [name for name, _ in histograms.top(1, key=lambda h: h.count)] == ['fast']
+
+
+def test_prometheus(monkeypatch):
+    monkeypatch.setattr(m, '_registry', {})  # so the test metric isn't served by later tests
+    histograms = m.Histograms()
+    histograms.observe(('roll', 'total'), 0.003)
+    histograms.observe(('roll', 'total'), 100)
+    m.register('test_seconds', histograms, ('command', 'phase'))
+    text = m.prometheus()
+    assert '# TYPE test_seconds histogram' in text
+    assert 'test_seconds_bucket{command="roll",phase="total",le="0.0064"} 1' in text
+    assert 'test_seconds_bucket{command="roll",phase="total",le="+Inf"} 2' in text
+    assert 'test_seconds_count{command="roll",phase="total"} 2' in text
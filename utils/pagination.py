@@ -0,0 +1,137 @@
+"""Reaction paginators for embeds with more than one page, all run by one manager.
+
+Sessions are kept in a dict by message id and looked up by a single raw reaction listener, so an
+open paginator costs no task and no wait_for. Pages are stored as embed dicts, the form in which
+they are sent to Discord. At most MAX_SESSIONS are open; starting another closes the least recently
+used one. Sessions expire TIMEOUT seconds after their last use, which is tracked with a timing wheel:
+one slot per TICK seconds, advanced by one task for all sessions.
+
+As with the paginator from the buttons package used before, only the command's author can turn the
+pages, and the message is deleted when the session is stopped or expires.
+
+Usage:
+    await ctx.bot.paginators.start(ctx, [first_embed, second_embed])"""
+import asyncio
+import logging
+from collections import OrderedDict, namedtuple
+from math import ceil
+from typing import List, Optional, Sequence, Tuple
+
+from discord import Embed, HTTPException
+
+log = logging.getLogger('bot.' + __name__)
+
+FIRST, PREVIOUS, STOP, NEXT, LAST = BUTTONS = ('⏮', '◀', '⏹', '▶', '⏭')
+MAX_SESSIONS = 500  # open paginators; the least recently used is closed when another starts
+TIMEOUT = 90  # seconds a paginator stays open after it was last used
+TICK = 5  # seconds per slot of the timing wheel, i.e. how late a session may expire
+
+Session = namedtuple('Session',
+                     'channel_id author_id pages index slot')
+
+
+class PaginatorManager:
+    """Owns all open paginators and the reaction listener that turns their pages."""
+
+    def __init__(self, bot, max_sessions: int = MAX_SESSIONS, timeout: float = TIMEOUT, tick: float = TICK):
+        self.bot = bot
+        self.max_sessions = max_sessions
+        self.tick = tick
+        self.ticks = ceil(timeout / tick)  # slots between a use of a session and its expiry
+        self.wheel = [set() for _ in range(self.ticks + 1)]  # message ids, by the slot they expire in
+        self.cursor = 0
+        self.sessions = OrderedDict()  # message id -> Session, least recently used first
+        self.task = None
+        self.stats = {'started': 0, 'evicted': 0, 'expired': 0}
+        bot.add_listener(self.on_raw_reaction_add)
+
+    def _schedule(self, message_id: int) -> int:
+        slot = (self.cursor + self.ticks) % len(self.wheel)
+        self.wheel[slot].add(message_id)
+        return slot
+
+    def add(self, message_id: int, channel_id: int, author_id: int, pages: Sequence[dict]) -> List[Session]:
+        """Open a session for a sent message. Returns the sessions closed to make room for it."""
+        evicted = []
+        while len(self.sessions) >= self.max_sessions:
+            evicted.append(self.sessions.popitem(last=False)[1])
+            self.stats['evicted'] += 1
+        self.sessions[message_id] = Session(channel_id, author_id, tuple(pages), 0, self._schedule(message_id))
+        self.stats['started'] += 1
+        return evicted
+
+    def press(self, message_id: int, user_id: int, emoji: str) -> Tuple[Optional[Session], Optional[dict]]:
+        """Handle a button. Returns the session, if the press was for one, and the page to show, if it changed.
+
+        The stop button closes the session; the caller then deletes its message."""
+        session = self.sessions.get(message_id)
+        if session is None or user_id != session.author_id or emoji not in BUTTONS:
+            return None, None
+        if emoji == STOP:
+            del self.sessions[message_id]
+            return session, None
+        last = len(session.pages) - 1
+        index = {FIRST: 0, PREVIOUS: max(session.index - 1, 0),
+                 NEXT: min(session.index + 1, last), LAST: last}[emoji]
+        changed = index != session.index
+        self.wheel[session.slot].discard(message_id)
+        session = self.sessions[message_id] = session._replace(index=index, slot=self._schedule(message_id))
+        self.sessions.move_to_end(message_id)
+        return session, session.pages[index] if changed else None
+
+    def advance(self) -> List[Tuple[int, Session]]:
+        """Move the wheel on by one slot. Returns the (message id, session) pairs that expired."""
+        self.cursor = (self.cursor + 1) % len(self.wheel)
+        due, self.wheel[self.cursor] = self.wheel[self.cursor], set()
+        expired = [(message_id, self.sessions.pop(message_id)) for message_id in due if message_id in self.sessions]
+        self.stats['expired'] += len(expired)
+        return expired
+
+    async def _delete(self, message_id: int, session: Session):
+        try:
+            await self.bot.http.delete_message(session.channel_id, message_id)
+        except HTTPException:
+            pass
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.tick)
+            for message_id, session in self.advance():
+                await self._delete(message_id, session)
+
+    async def start(self, ctx, pages: Sequence[Embed]):
+        """Send the first page and add the buttons; with one page, only the stop button."""
+        if self.task is None:
+            self.task = asyncio.get_event_loop().create_task(self._run())
+        pages = [page.to_dict() for page in pages]
+        message = await ctx.send(embed=Embed.from_dict(pages[0]))
+        for message_id, session in self.add(message.id, message.channel.id, ctx.author.id, pages):
+            await self._delete(message_id, session)
+        for button in BUTTONS if len(pages) > 1 else (STOP,):
+            try:
+                await message.add_reaction(button)
+            except HTTPException:
+                break
+
+    async def on_raw_reaction_add(self, payload):
+        if payload.message_id not in self.sessions:
+            return
+        emoji = str(payload.emoji)
+        session, page = self.press(payload.message_id, payload.user_id, emoji)
+        if session is None:
+            return
+        try:
+            if emoji == STOP:
+                return await self.bot.http.delete_message(session.channel_id, payload.message_id)
+            if payload.guild_id is not None:  # reactions can't be removed in direct messages
+                await self.bot.http.remove_reaction(session.channel_id, payload.message_id, emoji, payload.user_id)
+            if page is not None:
+                await self.bot.http.edit_message(session.channel_id, payload.message_id, embed=page)
+        except HTTPException:
+            log.debug('Failed to update paginator %d', payload.message_id, exc_info=True)
+
+    def close(self):
+        """Stop expiring sessions. The messages of open sessions are left as they are."""
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
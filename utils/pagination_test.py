@@ -0,0 +1,37 @@
+"""Pytests for pagination.py"""
+
+from types import SimpleNamespace
+
+import pagination as m
+
+
+def manager(**kwargs):
+    bot = SimpleNamespace(add_listener=lambda listener: None)
+    return m.PaginatorManager(bot, **kwargs)
+
+
+def test_press():
+    paginators = manager()
+    pages = [{'title': 'one'}, {'title': 'two'}, {'title': 'three'}]
+    paginators.add(1, 10, 100, pages)
+    assert paginators.press(1, 200, m.NEXT) == (None, None)  # not the author
+    assert paginators.press(1, 100, m.PREVIOUS)[1] is None  # already on the first page
+    assert paginators.press(1, 100, m.NEXT)[1] == {'title': 'two'}
+    assert paginators.press(1, 100, m.LAST)[1] == {'title': 'three'}
+    session, page = paginators.press(1, 100, m.STOP)
+    assert session.channel_id == 10 and page is None
+    assert 1 not in paginators.sessions
+
+
+def test_limits():
+    paginators = manager(max_sessions=2, timeout=10, tick=5)
+    paginators.add(1, 10, 100, [{}])
+    paginators.add(2, 10, 100, [{}])
+    paginators.press(1, 100, m.NEXT)  # 1 is now used more recently than 2
+    assert [session.channel_id for session in paginators.add(3, 30, 100, [{}])] == [10]
+    assert list(paginators.sessions) == [1, 3]
+    assert paginators.advance() == []
+    paginators.press(1, 100, m.NEXT)  # used again, expires a tick later than 3
+    assert [message_id for message_id, _ in paginators.advance()] == [3]
+    assert [message_id for message_id, _ in paginators.advance()] == [1]
+    assert not paginators.sessions
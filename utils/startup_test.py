@@ -0,0 +1,44 @@
+"""Pytests for startup.py"""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+import yaml
+
+import startup as m
+
+CONFIG = Path('config.yaml') if Path('config.yaml').exists() else Path('config.yaml.example')
+IMPORT_BUDGET = 5  # seconds, unless the config sets startup.import_budget
+COLD_IMPORT = """
+import json, sys
+from utils.startup import import_extensions
+tracer = import_extensions(sys.argv[1:])
+print(json.dumps([(phase.name, phase.seconds) for phase in tracer.phases]))
+"""
+
+
+def test_tracer():
+    tracer = m.StartupTracer()
+    with tracer.phase('nothing'):
+        pass
+    tracer.mark('ready')
+    assert [phase.name for phase in tracer.phases] == ['nothing', 'ready']
+    assert 'nothing' in tracer.timeline()
+
+
+def test_startup_budget():
+    """Cold import of all extensions, in a fresh interpreter, must fit in the configured budget."""
+    with open(CONFIG) as f:
+        config = yaml.safe_load(f)
+    if not Path('resources/srd').exists():
+        pytest.skip('SRD data is not downloaded, see scripts/download-srd.py')
+    result = subprocess.run([sys.executable, '-c', COLD_IMPORT, *config['load_extensions']],
+                            stdout=subprocess.PIPE, universal_newlines=True, check=True)
+    phases = json.loads(result.stdout)
+    total = sum(seconds for _, seconds in phases)
+    timeline = ', '.join(f'{name} {seconds:.2f}s' for name, seconds in phases)
+    budget = config.get('startup', {}).get('import_budget', IMPORT_BUDGET)
+    assert total <= budget, f'cold import took {total:.2f}s: {timeline}'
@@ -0,0 +1,88 @@
+"""Watchdog for the event loop: measures how late the loop runs, and finds out what blocks it.
+
+A heartbeat task sleeps for INTERVAL and records how much later than that it woke up. A sampler
+thread checks the last heartbeat; when the loop has been stuck for longer than the threshold, it
+takes the stack of the event loop thread with sys._current_frames and logs it, once per stall.
+
+Usage, from bot.py:
+    watchdog = LoopWatchdog()
+    watchdog.start()  # with the event loop running
+    watchdog.percentiles()  # recent lag, e.g. for ;status"""
+import asyncio
+import logging
+import sys
+import threading
+import traceback
+from collections import deque
+from time import perf_counter
+
+from utils.metrics import Histograms, register
+
+log = logging.getLogger('bot.' + __name__)
+
+INTERVAL = 0.1  # seconds between heartbeats
+LAG_THRESHOLD = 0.25  # seconds the loop may be stuck before its stack is logged
+SAMPLE_INTERVAL = 0.05  # seconds between checks by the sampler thread
+RECENT = 3000  # heartbeats kept for percentiles, five minutes at INTERVAL
+
+loop_lag = Histograms()  # 'event_loop' -> lag of every heartbeat, since startup
+register('tavern_loop_lag_seconds', loop_lag, ('loop',))
+
+
+class LoopWatchdog:
+    def __init__(self, threshold: float = LAG_THRESHOLD, interval: float = INTERVAL):
+        self.threshold = threshold
+        self.interval = interval
+        self.recent = deque(maxlen=RECENT)  # lag of the most recent heartbeats, in seconds
+        self.heartbeat = perf_counter()
+        self.loop_thread = None
+        self.task = None
+        self.stopped = threading.Event()
+        self.stalls = 0
+
+    def start(self):
+        """Start the heartbeat on the running event loop and the sampler thread."""
+        if self.task is not None:
+            return
+        self.loop_thread = threading.get_ident()
+        self.heartbeat = perf_counter()
+        self.task = asyncio.get_event_loop().create_task(self._beat())
+        self.stopped.clear()
+        threading.Thread(target=self._sample, name='loop-watchdog', daemon=True).start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def _beat(self):
+        while True:
+            start = perf_counter()
+            await asyncio.sleep(self.interval)
+            self.heartbeat = now = perf_counter()
+            lag = max(0.0, now - start - self.interval)
+            self.recent.append(lag)
+            loop_lag.observe('event_loop', lag)
+
+    def _sample(self):
+        reported = None  # heartbeat of the stall that has been logged
+        while not self.stopped.wait(SAMPLE_INTERVAL):
+            heartbeat = self.heartbeat
+            stalled = perf_counter() - heartbeat - self.interval
+            if stalled < self.threshold or reported == heartbeat:
+                continue
+            reported = heartbeat
+            self.stalls += 1
+            frame = sys._current_frames().get(self.loop_thread)
+            stack = ''.join(traceback.format_stack(frame)) if frame is not None else 'unknown\n'
+            log.warning('Event loop blocked for %.0fms, currently at:\n%s', stalled * 1000, stack.rstrip())
+
+    def percentiles(self, percents=(50, 95, 99)) -> dict:
+        """Lag percentiles over the recent heartbeats, in seconds, and the maximum as 100."""
+        lags = sorted(self.recent)
+        if not lags:
+            return {}
+        result = {percent: lags[min(len(lags) - 1, int(len(lags) * percent / 100))] for percent in percents}
+        result[100] = lags[-1]
+        return result
@@ -0,0 +1,30 @@
+"""Pytests for watchdog.py"""
+
+import asyncio
+import logging
+import time
+
+import watchdog as m
+
+
+def blocking_call():
+    time.sleep(0.4)
+
+
+def test_watchdog(caplog):
+    async def run():
+        watchdog = m.LoopWatchdog(threshold=0.1, interval=0.02)
+        watchdog.start()
+        await asyncio.sleep(0.1)
+        blocking_call()
+        await asyncio.sleep(0.1)
+        watchdog.stop()
+        return watchdog
+
+    with caplog.at_level(logging.WARNING, logger='bot'):
+        watchdog = asyncio.run(run())
+    assert watchdog.stalls == 1
+    assert 'blocking_call' in caplog.text
+    percentiles = watchdog.percentiles()
+    assert percentiles[100] >= 0.3
+    assert percentiles[50] < 0.1